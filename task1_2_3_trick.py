@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 
+import sys
+from array import array
+
 
 def gate_AND(input1: int, input2: int, output: int) -> str:
     return 'GATE {} AND {} {}'.format(output, input1, input2)
@@ -17,110 +20,352 @@ def gate_OUTPUT(from_id: int, output_id: int) -> str:
     return 'OUTPUT {} {}'.format(output_id, from_id)
 
 
-def generate_2_3_block(index: int, n: int, block_start: int) -> (str, int):
-    """
-    Generate a 2-3 block
+# A netlist is produced as a sequence of records (id, kind, input1, input2), where 'kind' is 'AND', 'OR', 'NOT' or
+# 'OUTPUT'. For 'OUTPUT' records 'id' is the output index and 'input1' is the node connected to it. Unused inputs are -1
 
-    :param index: digit index in each of three input numbers
-    :param n: number of digits in a number
-    :param block_start: gate index of a block to start this block with
 
-    :return: generated block and next 'block_start'
+def format_record(record: tuple) -> str:
     """
-    a = index
-    b = index + n
-    c = index + 2 * n
+    Format a netlist record as a line of the text netlist format
+    """
+    node, kind, input1, input2 = record
+    if kind == 'AND':
+        return gate_AND(input1, input2, node)
+    if kind == 'OR':
+        return gate_OR(input1, input2, node)
+    if kind == 'NOT':
+        return gate_NOT(input1, node)
+    return gate_OUTPUT(input1, node)
 
-    nodes = []
-    new_node = block_start
 
-    # Upper bit
+BLOCK_2_3_SIZE = 10  # Number of gates in a 2-3 block
+BLOCK_ZERO_SIZE = 2  # Number of gates in a zero block
 
-    nodes.append(tuple([new_node, gate_AND(a, b, new_node)]))  # 0
-    new_node += 1
 
-    nodes.append(tuple([new_node, gate_OR(a, b, new_node)]))  # 1
-    new_node += 1
+def generate_full_adder_records(a: int, b: int, c: int, block_start: int):
+    """
+    Generate records of the gates of a 2-3 block adding bits 'a', 'b' and 'c'. The block uses BLOCK_2_3_SIZE gates
+    starting with 'block_start'; the upper (carry) bit is the gate block_start + 3, the lower (sum) bit is the gate
+    block_start + 9
+    """
+    g = block_start
 
-    nodes.append(tuple([new_node, gate_AND(nodes[1][0], c, new_node)]))  # 2
-    new_node += 1
+    # Upper bit
 
-    nodes.append(tuple([new_node, gate_OR(nodes[0][0], nodes[2][0], new_node)]))  # 3
-    new_node += 1
+    yield g, 'AND', a, b  # 0
+    yield g + 1, 'OR', a, b  # 1
+    yield g + 2, 'AND', g + 1, c  # 2
+    yield g + 3, 'OR', g, g + 2  # 3
 
     # Lower bit
 
-    nodes.append(tuple([new_node, gate_NOT(nodes[0][0], new_node)]))  # 4
-    new_node += 1
-
-    nodes.append(tuple([new_node, gate_AND(nodes[4][0], nodes[1][0], new_node)]))  # 5
-    new_node += 1
-
-    nodes.append(tuple([new_node, gate_AND(nodes[5][0], c, new_node)]))  # 6
-    new_node += 1
+    yield g + 4, 'NOT', g, -1  # 4
+    yield g + 5, 'AND', g + 4, g + 1  # 5
+    yield g + 6, 'AND', g + 5, c  # 6
+    yield g + 7, 'OR', g + 5, c  # 7
+    yield g + 8, 'NOT', g + 6, -1  # 8
+    yield g + 9, 'AND', g + 8, g + 7  # 9
 
-    nodes.append(tuple([new_node, gate_OR(nodes[5][0], c, new_node)]))  # 7
-    new_node += 1
 
-    nodes.append(tuple([new_node, gate_NOT(nodes[6][0], new_node)]))  # 8
-    new_node += 1
+def generate_2_3_block_records(index: int, n: int, block_start: int):
+    """
+    Generate records of a 2-3 block. The block uses BLOCK_2_3_SIZE gates starting with 'block_start'
 
-    nodes.append(tuple([new_node, gate_AND(nodes[8][0], nodes[7][0], new_node)]))  # 9
-    new_node += 1
+    :param index: digit index in each of three input numbers
+    :param n: number of digits in a number
+    :param block_start: gate index of a block to start this block with
+    """
+    yield from generate_full_adder_records(index, index + n, index + 2 * n, block_start)
 
     # Upper bit number
-    nodes.append(tuple([-1, gate_OUTPUT(nodes[3][0], index + 1)]))
+    yield index + 1, 'OUTPUT', block_start + 3, -1
     # Lower bit number
-    nodes.append(tuple([-1, gate_OUTPUT(nodes[9][0], (n + 1) + index)]))
+    yield (n + 1) + index, 'OUTPUT', block_start + 9, -1
+
+
+def generate_zero_block_records(n: int, block_start: int):
+    """
+    Generate records of a special block for zero-padding of upper and lower bit numbers. The block uses
+    BLOCK_ZERO_SIZE gates starting with 'block_start'.
+    An implicit assumption is made that at least one input node (with index 0) exists.
+
+    :param n: number of digits in a number
+    :param block_start: gate index of a block to start this block with
+    """
+    g = block_start
+
+    yield g, 'NOT', 0, -1  # 0
+    yield g + 1, 'AND', 0, g  # 1
 
-    result = '\n'.join([node[1] for node in nodes])
-    return result, new_node
+    # Upper bit number padding (least significant bit)
+    yield 0, 'OUTPUT', g + 1, -1
+    # Lower bit number padding (most significant bit)
+    yield 2 * (n + 1) - 1, 'OUTPUT', g + 1, -1
+
+
+def generate_2_3_block(index: int, n: int, block_start: int) -> (str, int):
+    """
+    Generate a 2-3 block
+
+    :param index: digit index in each of three input numbers
+    :param n: number of digits in a number
+    :param block_start: gate index of a block to start this block with
+
+    :return: generated block and next 'block_start'
+    """
+    result = '\n'.join(map(format_record, generate_2_3_block_records(index, n, block_start)))
+    return result, block_start + BLOCK_2_3_SIZE
 
 
 def generate_zero_block(n: int, block_start: int) -> (str, int):
     """
     Generate a special block for zero-padding of upper and lower bit numbers.
-    An implicit assumption is made that at least one input node (with index 0)
-    exists.
+    An implicit assumption is made that at least one input node (with index 0) exists.
 
     :param n: number of digits in a number
     :param block_start: gate index of a block to start this block with
 
     :return: generated block and next 'block_start'
     """
-    nodes = []
-    new_node = block_start
+    result = '\n'.join(map(format_record, generate_zero_block_records(n, block_start)))
+    return result, block_start + BLOCK_ZERO_SIZE
+
+
+def generate_2_3_netlist(n: int):
+    """
+    Generate records of the whole 2-3 trick circuit for n-digit numbers, one block at a time
+    """
+    block_start = n * 3
+    for i in range(n):
+        yield from generate_2_3_block_records(i, n, block_start)
+        block_start += BLOCK_2_3_SIZE
 
-    nodes.append(tuple([new_node, gate_NOT(0, new_node)]))  # 0
-    new_node += 1
+    yield from generate_zero_block_records(n, block_start)
 
-    nodes.append(tuple([new_node, gate_AND(0, nodes[0][0], new_node)]))  # 1
-    new_node += 1
 
-    # Upper bit number padding (least significant bit)
-    nodes.append(tuple([-1, gate_OUTPUT(nodes[1][0], 0)]))
-    # Lower bit number padding (most significant bit)
-    nodes.append(tuple([-1, gate_OUTPUT(nodes[1][0], 2 * (n + 1) - 1)]))
+class _CircuitBuilder:
+    """
+    A builder of a netlist which keeps its records and the depth of every node. The constant zero is represented by
+    None and is folded into the gates using it
+    """
+    def __init__(self, inputs_count: int):
+        self.records = []
+        self.depth = [0] * inputs_count
+        self.next_node = inputs_count
+        self.zero_node = None
+
+    def gate(self, kind: str, input1: int, input2: int = -1) -> int:
+        node = self.next_node
+        self.next_node += 1
+        self.records.append((node, kind, input1, input2))
+        self.depth.append(1 + max(self.depth[input1], self.depth[input2] if input2 >= 0 else 0))
+        return node
+
+    def gate_and(self, x, y):
+        if x is None or y is None:
+            return None
+        return self.gate('AND', x, y)
+
+    def gate_or(self, x, y):
+        if x is None:
+            return y
+        if y is None:
+            return x
+        return self.gate('OR', x, y)
+
+    def gate_xor(self, x, y, x_and_y=None):
+        """
+        Build x XOR y = (x OR y) AND NOT (x AND y), reusing 'x_and_y' if it is already built
+        """
+        if x is None:
+            return y
+        if y is None:
+            return x
+        if x_and_y is None:
+            x_and_y = self.gate('AND', x, y)
+        return self.gate('AND', self.gate('OR', x, y), self.gate('NOT', x_and_y))
+
+    def full_adder(self, a: int, b: int, c: int) -> tuple:
+        """
+        Add three bits by a 2-3 block
+        :return: (upper bit, lower bit)
+        """
+        block_start = self.next_node
+        for record in generate_full_adder_records(a, b, c, block_start):
+            self.gate(record[1], record[2], record[3])
+        return block_start + 3, block_start + 9
+
+    def output(self, index: int, node):
+        if node is None:
+            if self.zero_node is None:
+                # An implicit assumption is made that at least one input node (with index 0) exists
+                self.zero_node = self.gate('AND', 0, self.gate('NOT', 0))
+            node = self.zero_node
+        self.records.append((index, 'OUTPUT', node, -1))
+        return self.depth[node]
+
+
+def _reduce_columns(builder: _CircuitBuilder, columns: list) -> list:
+    """
+    Reduce columns of bits (the i-th column holds nodes of weight 2^i) by layers of 2-3 blocks working as carry-save
+    compressors, until every column holds at most two bits. Every layer turns each three bits of a column into a bit
+    of the same column and a bit of the next one, so the number of layers is logarithmic in the column height
+    """
+    while max(len(column) for column in columns) > 2:
+        next_columns = [[] for _ in range(len(columns) + 1)]
+        for weight, column in enumerate(columns):
+            triples = len(column) // 3
+            for t in range(triples):
+                upper, lower = builder.full_adder(column[3 * t], column[3 * t + 1], column[3 * t + 2])
+                next_columns[weight].append(lower)
+                next_columns[weight + 1].append(upper)
+            next_columns[weight].extend(column[3 * triples:])
+        while len(next_columns[-1]) == 0:
+            next_columns.pop()
+        columns = next_columns
+    return columns
+
+
+def _kogge_stone_add(builder: _CircuitBuilder, x: list, y: list) -> list:
+    """
+    Add two numbers given as lists of bit nodes (the least significant bit first, None for zero) by a Kogge-Stone
+    parallel prefix adder
+    :return: a list of bit nodes of the sum, one bit longer than the operands
+    """
+    size = len(x)
+    generate = []
+    propagate = []
+    for x_i, y_i in zip(x, y):
+        g_i = builder.gate_and(x_i, y_i)
+        generate.append(g_i)
+        propagate.append(builder.gate_xor(x_i, y_i, g_i))
+    half_sums = list(propagate)
+    # Carries only start at bits where both operands may be ones
+    first_generate = next((i for i, g_i in enumerate(generate) if g_i is not None), size)
+
+    # After the step with distance d, generate[i] is the carry out of bits [i - 2d + 1, i]
+    distance = 1
+    while distance < size:
+        next_generate = list(generate)
+        next_propagate = list(propagate)
+        for i in range(distance, size):
+            next_generate[i] = builder.gate_or(generate[i], builder.gate_and(propagate[i], generate[i - distance]))
+            # Products of propagate bits are only used to pass the carries of the lower bits further on
+            if i - 2 * distance >= first_generate:
+                next_propagate[i] = builder.gate_and(propagate[i], propagate[i - distance])
+        generate = next_generate
+        propagate = next_propagate
+        distance *= 2
+
+    result = [half_sums[0]]
+    for i in range(1, size):
+        result.append(builder.gate_xor(half_sums[i], generate[i - 1]))
+    result.append(generate[size - 1])
+    return result
+
+
+def generate_multi_operand_adder(k: int, n: int) -> (list, dict):
+    """
+    Generate a circuit adding k n-digit numbers: a tree of 2-3 blocks reduces the operands to two numbers with a depth
+    logarithmic in k, and a Kogge-Stone adder adds them with a depth logarithmic in n. Inputs of the i-th number are
+    nodes i * n .. (i + 1) * n - 1 (the least significant bit first); outputs are the bits of the sum
 
-    result = '\n'.join(node[1] for node in nodes)
-    return result, new_node
+    :return: the records of the circuit and its statistics: {'gates': number of gates, 'depth': circuit depth}
+    """
+    builder = _CircuitBuilder(k * n)
 
+    columns = [[i * n + j for i in range(k)] for j in range(n)]
+    columns = _reduce_columns(builder, columns)
 
-def main():
-    n = int(input())
+    x = [column[0] if len(column) > 0 else None for column in columns]
+    y = [column[1] if len(column) > 1 else None for column in columns]
+    result = _kogge_stone_add(builder, x, y)
+
+    # The sum of k n-digit numbers has at most n + ceil(log2(k)) digits
+    result_size = n + (k - 1).bit_length()
+    result += [None] * (result_size - len(result))
+
+    depth = 0
+    for index in range(result_size):
+        depth = max(depth, builder.output(index, result[index]))
+
+    return builder.records, {'gates': builder.next_node - k * n, 'depth': depth}
 
-    blocks = []
-    block = None
-    block_start = n * 3
-    for i in range(n):
-        block, block_start = generate_2_3_block(i, n, block_start)
-        blocks.append(block)
 
-    block, block_start = generate_zero_block(n, block_start)
-    blocks.append(block)
+WRITE_CHUNK_RECORDS = 1 << 14  # Number of records accumulated before a write to the output stream
 
-    result = '\n'.join(blocks)
-    print(result)
+# The binary netlist format: BINARY_MAGIC followed by records of 4 little-endian signed 64-bit integers
+# (id, kind code, input1, input2)
+BINARY_MAGIC = b'NETLIST1'
+BINARY_CODES = {
+    'AND': 0,
+    'OR': 1,
+    'NOT': 2,
+    'OUTPUT': 3,
+}
+
+
+def write_text_netlist(records, stream):
+    """
+    Write netlist 'records' in the text format to a binary 'stream', WRITE_CHUNK_RECORDS records at a time
+    """
+    lines = []
+    for record in records:
+        lines.append(format_record(record))
+        if len(lines) >= WRITE_CHUNK_RECORDS:
+            lines.append('')
+            stream.write('\n'.join(lines).encode())
+            lines = []
+    if len(lines) > 0:
+        lines.append('')
+        stream.write('\n'.join(lines).encode())
+
+
+def write_binary_netlist(records, stream):
+    """
+    Write netlist 'records' in the binary format to a binary 'stream', WRITE_CHUNK_RECORDS records at a time
+    """
+    stream.write(BINARY_MAGIC)
+    chunk = array('q')
+    for node, kind, input1, input2 in records:
+        chunk.extend((node, BINARY_CODES[kind], input1, input2))
+        if len(chunk) >= 4 * WRITE_CHUNK_RECORDS:
+            if sys.byteorder != 'little':
+                chunk.byteswap()
+            stream.write(chunk.tobytes())
+            chunk = array('q')
+    if sys.byteorder != 'little':
+        chunk.byteswap()
+    stream.write(chunk.tobytes())
+
+
+WRITERS = {
+    'text': write_text_netlist,
+    'binary': write_binary_netlist,
+}
+
+
+def main():
+    output_format = sys.argv[1] if len(sys.argv) > 1 else 'text'
+    if output_format not in WRITERS:
+        raise Exception("Unknown output format '{}'. Available formats: {}".format(output_format, ', '.join(WRITERS)))
+
+    # Either 'n' for the 2-3 trick, or 'n k' for an adder of k numbers
+    parameters = list(map(int, input().split()))
+    n = parameters[0]
+
+    if len(parameters) > 1:
+        records, statistics = generate_multi_operand_adder(parameters[1], n)
+        print('gates: {}, depth: {}'.format(statistics['gates'], statistics['depth']), file=sys.stderr)
+    else:
+        records = generate_2_3_netlist(n)
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'wb') as stream:
+            WRITERS[output_format](records, stream)
+    else:
+        WRITERS[output_format](records, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import sys
+from array import array
+
+from task1_2_3_trick import WRITERS
+from task1_netlist_simulator import OP_AND, OP_OR, OP_NOT, read_netlist
+
+
+def main():
+    output_format = sys.argv[1] if len(sys.argv) > 1 else 'text'
+    if output_format not in WRITERS:
+        raise Exception("Unknown output format '{}'".format(output_format))
+
+    table = read_netlist(sys.stdin.buffer)
+    records, statistics = optimize_netlist(table)
+
+    print('gates: {} -> {}, depth: {} -> {}'.format(
+        statistics['gates_before'], statistics['gates_after'],
+        statistics['depth_before'], statistics['depth_after'],
+    ), file=sys.stderr)
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'wb') as stream:
+            WRITERS[output_format](records, stream)
+    else:
+        WRITERS[output_format](records, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+
+
+OP_INPUT = -1  # Operation of the DAG nodes which are circuit inputs
+
+CONSTANT_ZERO = -2  # DAG node of the constant zero
+CONSTANT_ONE = -3  # DAG node of the constant one
+
+KIND_NAMES = {
+    OP_AND: 'AND',
+    OP_OR: 'OR',
+    OP_NOT: 'NOT',
+}
+
+
+class NetlistDag:
+    """
+    A hash-consed DAG of a netlist: structurally identical gates are represented by one node, and gates are simplified
+    as they are added:
+    * gates with constant inputs are folded (constants are CONSTANT_ZERO and CONSTANT_ONE)
+    * NOT (NOT x) is x
+    * x AND x, x OR x are x; x AND NOT x is zero, x OR NOT x is one
+    Nodes are numbered in the order of their creation, the first 'inputs_count' nodes are the circuit inputs
+    """
+    def __init__(self, inputs_count: int):
+        self.operations = array('b', [OP_INPUT] * inputs_count)
+        self.inputs1 = array('q', [-1] * inputs_count)
+        self.inputs2 = array('q', [-1] * inputs_count)
+        self.inputs_count = inputs_count
+        self._unique = {}
+
+    def _node(self, operation: int, input1: int, input2: int = -1) -> int:
+        key = (operation, input1, input2)
+        node = self._unique.get(key)
+        if node is None:
+            node = len(self.operations)
+            self.operations.append(operation)
+            self.inputs1.append(input1)
+            self.inputs2.append(input2)
+            self._unique[key] = node
+        return node
+
+    def constant_gate(self, constant: int) -> int:
+        """
+        Get a gate computing a constant from the input 0, as the simplifying methods never return one
+        """
+        if self.inputs_count == 0:
+            raise Exception("A circuit without inputs can not compute a constant")
+        zero = self._node(OP_AND, 0, self._node(OP_NOT, 0))
+        return zero if constant == CONSTANT_ZERO else self._node(OP_NOT, zero)
+
+    def _is_negation(self, x: int, y: int) -> bool:
+        """
+        Check whether x is NOT y or y is NOT x
+        """
+        return (x >= 0 and self.operations[x] == OP_NOT and self.inputs1[x] == y) or \
+            (y >= 0 and self.operations[y] == OP_NOT and self.inputs1[y] == x)
+
+    def node_not(self, x: int) -> int:
+        if x == CONSTANT_ZERO:
+            return CONSTANT_ONE
+        if x == CONSTANT_ONE:
+            return CONSTANT_ZERO
+        if self.operations[x] == OP_NOT:
+            return self.inputs1[x]
+        return self._node(OP_NOT, x)
+
+    def node_and(self, x: int, y: int) -> int:
+        if x == CONSTANT_ZERO or y == CONSTANT_ZERO:
+            return CONSTANT_ZERO
+        if x == CONSTANT_ONE:
+            return y
+        if y == CONSTANT_ONE or x == y:
+            return x
+        if self._is_negation(x, y):
+            return CONSTANT_ZERO
+        return self._node(OP_AND, min(x, y), max(x, y))
+
+    def node_or(self, x: int, y: int) -> int:
+        if x == CONSTANT_ONE or y == CONSTANT_ONE:
+            return CONSTANT_ONE
+        if x == CONSTANT_ZERO:
+            return y
+        if y == CONSTANT_ZERO or x == y:
+            return x
+        if self._is_negation(x, y):
+            return CONSTANT_ONE
+        return self._node(OP_OR, min(x, y), max(x, y))
+
+
+def _inputs_count(table) -> int:
+    """
+    Get the number of circuit inputs, assuming they are the nodes preceding the first gate
+    """
+    if len(table.gates) == 0:
+        return table.nodes_count
+    return min(table.gates)
+
+
+def netlist_depth(table) -> int:
+    """
+    Get the depth of a netlist: the maximum number of gates on a path from an input to an output
+    """
+    depth = array('l', [0]) * table.nodes_count
+    for input1, input2, gate in zip(table.inputs1, table.inputs2, table.gates):
+        depth[gate] = 1 + max(depth[input1], depth[input2] if input2 >= 0 else 0)
+    return max((depth[node] for node in table.outputs if node >= 0), default=0)
+
+
+def build_dag(table) -> (NetlistDag, list):
+    """
+    Load a netlist (a GateTable) into a NetlistDag
+    :return: (the DAG, a list of DAG nodes of the outputs)
+    """
+    inputs_count = _inputs_count(table)
+    dag = NetlistDag(inputs_count)
+
+    nodes = array('q', range(inputs_count)) + array('q', [-1]) * max(0, table.nodes_count - inputs_count)
+    for operation, input1, input2, gate in zip(table.operations, table.inputs1, table.inputs2, table.gates):
+        if operation == OP_AND:
+            nodes[gate] = dag.node_and(nodes[input1], nodes[input2])
+        elif operation == OP_OR:
+            nodes[gate] = dag.node_or(nodes[input1], nodes[input2])
+        else:
+            nodes[gate] = dag.node_not(nodes[input1])
+
+    return dag, [nodes[node] if node >= 0 else CONSTANT_ZERO for node in table.outputs]
+
+
+def emit_dag(dag: NetlistDag, outputs: list) -> list:
+    """
+    Emit the gates of a DAG reachable from the outputs, renumbered consecutively after the circuit inputs. Constant
+    outputs are computed from the input 0
+    :return: a list of records (id, kind, input1, input2) as of task1_2_3_trick
+    """
+    if any(node < 0 for node in outputs):
+        outputs = [dag.constant_gate(node) if node < 0 else node for node in outputs]
+
+    # Dead gates elimination: nodes are created after their inputs, so a reverse pass marks all reachable ones
+    live = bytearray(len(dag.operations))
+    for node in outputs:
+        live[node] = 1
+    for node in range(len(dag.operations) - 1, dag.inputs_count - 1, -1):
+        if live[node]:
+            live[dag.inputs1[node]] = 1
+            if dag.inputs2[node] >= 0:
+                live[dag.inputs2[node]] = 1
+
+    numbers = array('q', range(dag.inputs_count)) + array('q', [-1]) * (len(dag.operations) - dag.inputs_count)
+    records = []
+    next_number = dag.inputs_count
+    for node in range(dag.inputs_count, len(dag.operations)):
+        if not live[node]:
+            continue
+        numbers[node] = next_number
+        input2 = dag.inputs2[node]
+        records.append((next_number, KIND_NAMES[dag.operations[node]],
+                        numbers[dag.inputs1[node]], numbers[input2] if input2 >= 0 else -1))
+        next_number += 1
+
+    for index, node in enumerate(outputs):
+        records.append((index, 'OUTPUT', numbers[node], -1))
+    return records
+
+
+def optimize_netlist(table) -> (list, dict):
+    """
+    Optimize a netlist (a GateTable) by constant propagation, double negation removal, common subexpression and dead
+    gates elimination
+    :return: (a list of records of the optimized netlist, statistics of the netlists before and after optimization:
+    {'gates_before', 'gates_after', 'depth_before', 'depth_after'})
+    """
+    dag, outputs = build_dag(table)
+    records = emit_dag(dag, outputs)
+
+    depth = {}
+    for gate, kind, input1, input2 in records:
+        if kind != 'OUTPUT':
+            depth[gate] = 1 + max(depth.get(input1, 0), depth.get(input2, 0))
+
+    return records, {
+        'gates_before': len(table.gates),
+        'gates_after': len(records) - len(outputs),
+        'depth_before': netlist_depth(table),
+        'depth_after': max((depth.get(record[2], 0) for record in records if record[1] == 'OUTPUT'), default=0),
+    }
+
+
+if __name__ == '__main__':
+    main()
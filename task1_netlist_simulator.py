@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+import itertools
+import random
+import sys
+from array import array
+
+from task1_2_3_trick import BINARY_CODES, BINARY_MAGIC
+
+
+def main():
+    stream = sys.stdin.buffer if len(sys.argv) < 2 else open(sys.argv[1], 'rb')
+    table = read_netlist(stream)
+
+    if len(sys.argv) > 2:
+        # An adder of k numbers: inputs of the numbers go before all gates
+        k = int(sys.argv[2])
+        n = (min(table.gates) if len(table.gates) > 0 else table.nodes_count) // k
+        vectors_count, mismatch = check_adder_circuit(table, k, n)
+        if mismatch is None:
+            print('ok {}'.format(vectors_count))
+        else:
+            print('fail operands={} sum={}'.format(*mismatch))
+        return
+
+    n = len(table.outputs) // 2 - 1
+
+    vectors_count, mismatch = check_2_3_circuit(table, n)
+
+    if mismatch is None:
+        print('ok {}'.format(vectors_count))
+    else:
+        print('fail a={} b={} c={} upper={} lower={}'.format(*mismatch))
+
+
+OP_AND = 0
+OP_OR = 1
+OP_NOT = 2
+
+OPERATIONS = {
+    'AND': OP_AND,
+    'OR': OP_OR,
+    'NOT': OP_NOT,
+}
+
+
+class GateTable:
+    """
+    A netlist stored as parallel arrays, one element per gate, in the order of evaluation:
+    * 'operations' - OP_AND, OP_OR or OP_NOT
+    * 'inputs1', 'inputs2' - identifiers of the input nodes ('inputs2' is -1 for OP_NOT)
+    * 'gates' - identifiers of the nodes computed by the gates
+    'outputs' is a list of node identifiers, where the i-th element is the node of the i-th output. Nodes which are not
+    computed by any gate are circuit inputs
+    """
+    def __init__(self):
+        self.operations = array('b')
+        self.inputs1 = array('q')
+        self.inputs2 = array('q')
+        self.gates = array('q')
+        self.outputs = []
+        self.nodes_count = 0
+
+    def add_gate(self, gate: int, operation: int, input1: int, input2: int = -1):
+        self.operations.append(operation)
+        self.inputs1.append(input1)
+        self.inputs2.append(input2)
+        self.gates.append(gate)
+        self.nodes_count = max(self.nodes_count, gate + 1, input1 + 1, input2 + 1)
+
+    def set_output(self, output: int, node: int):
+        if output >= len(self.outputs):
+            self.outputs.extend([-1] * (output + 1 - len(self.outputs)))
+        self.outputs[output] = node
+        self.nodes_count = max(self.nodes_count, node + 1)
+
+
+def parse_netlist(lines) -> GateTable:
+    """
+    Parse a netlist of 'GATE <id> <AND|OR> <input> <input>', 'GATE <id> NOT <input>' and 'OUTPUT <index> <id>' lines
+    """
+    table = GateTable()
+    for line in lines:
+        tokens = line.split()
+        if len(tokens) == 0:
+            continue
+        if tokens[0] == 'GATE':
+            operation = OPERATIONS.get(tokens[2])
+            if operation is None:
+                raise Exception("Unknown gate operation '{}'".format(tokens[2]))
+            if operation == OP_NOT:
+                table.add_gate(int(tokens[1]), operation, int(tokens[3]))
+            else:
+                table.add_gate(int(tokens[1]), operation, int(tokens[3]), int(tokens[4]))
+        elif tokens[0] == 'OUTPUT':
+            table.set_output(int(tokens[1]), int(tokens[2]))
+        else:
+            raise Exception("Unknown netlist line '{}'".format(line.strip()))
+    return table
+
+
+BINARY_READ_RECORDS = 1 << 14  # Number of records of a binary netlist read at once
+
+
+def read_binary_netlist(stream) -> GateTable:
+    """
+    Read a netlist in the binary format of task1_2_3_trick from a binary 'stream', positioned after BINARY_MAGIC
+    """
+    operations = {code: OPERATIONS.get(kind) for kind, code in BINARY_CODES.items()}
+    output_code = BINARY_CODES['OUTPUT']
+
+    table = GateTable()
+    while True:
+        data = stream.read(4 * 8 * BINARY_READ_RECORDS)
+        if len(data) == 0:
+            break
+        if len(data) % (4 * 8) != 0:
+            raise Exception("Binary netlist is truncated")
+        chunk = array('q', data)
+        if sys.byteorder != 'little':
+            chunk.byteswap()
+        for i in range(0, len(chunk), 4):
+            node, code, input1, input2 = chunk[i:i + 4]
+            if code == output_code:
+                table.set_output(node, input1)
+            elif code in operations:
+                table.add_gate(node, operations[code], input1, input2)
+            else:
+                raise Exception("Unknown gate code {}".format(code))
+    return table
+
+
+def read_netlist(stream) -> GateTable:
+    """
+    Read a netlist in the text or the binary format from a binary 'stream'
+    """
+    magic = stream.read(len(BINARY_MAGIC))
+    if magic == BINARY_MAGIC:
+        return read_binary_netlist(stream)
+
+    # The magic may have consumed a part of the first line
+    lines = itertools.chain([magic + stream.readline()], stream)
+    return parse_netlist(line.decode() for line in lines)
+
+
+def simulate(table: GateTable, input_words: list, mask: int) -> list:
+    """
+    Evaluate the netlist on many input vectors at once. Every node value is a word (an integer), whose i-th bit is the
+    value of the node for the i-th input vector
+    :param input_words: words of the circuit inputs; the i-th word is the value of the node i
+    :param mask: a word with ones in the bits of all input vectors
+    :return: a list of words of the circuit outputs
+    """
+    values = [0] * max(table.nodes_count, len(input_words))
+    values[:len(input_words)] = input_words
+
+    for operation, input1, input2, gate in zip(table.operations, table.inputs1, table.inputs2, table.gates):
+        if operation == OP_AND:
+            values[gate] = values[input1] & values[input2]
+        elif operation == OP_OR:
+            values[gate] = values[input1] | values[input2]
+        else:
+            values[gate] = values[input1] ^ mask
+
+    return [values[node] if node >= 0 else 0 for node in table.outputs]
+
+
+def _add_words(x: list, y: list, mask: int) -> list:
+    """
+    Add numbers given as lists of bit words (the least significant bit first) by a bit-sliced ripple-carry adder
+    """
+    size = max(len(x), len(y))
+    x = x + [0] * (size - len(x))
+    y = y + [0] * (size - len(y))
+
+    result = []
+    carry = 0
+    for x_i, y_i in zip(x, y):
+        result.append(x_i ^ y_i ^ carry)
+        carry = ((x_i & y_i) | (carry & (x_i ^ y_i))) & mask
+    result.append(carry)
+    return result
+
+
+def _difference_words(expected: list, actual: list, mask: int) -> int:
+    """
+    Compare two numbers given as lists of bit words
+    :return: a word with ones in the bits of input vectors where the numbers differ
+    """
+    size = max(len(expected), len(actual))
+    expected = expected + [0] * (size - len(expected))
+    actual = actual + [0] * (size - len(actual))
+
+    mismatch = 0
+    for expected_i, actual_i in zip(expected, actual):
+        mismatch |= expected_i ^ actual_i
+    return mismatch & mask
+
+
+def _find_mismatch(input_words: list, output_words: list, n: int, mask: int) -> int:
+    """
+    Compare a + b + c with the sum of the two numbers of a 2-3 circuit outputs for every input vector
+    :return: a word with ones in the bits of input vectors giving a wrong sum
+    """
+    expected = _add_words(_add_words(input_words[:n], input_words[n:2 * n], mask), input_words[2 * n:3 * n], mask)
+    actual = _add_words(output_words[:n + 1], output_words[n + 1:2 * (n + 1)], mask)
+    return _difference_words(expected, actual, mask)
+
+
+def _decode_vector(words: list, bit: int) -> int:
+    """
+    Extract the number given by the 'bit'-th bits of bit words (the least significant bit first)
+    """
+    return sum(((word >> bit) & 1) << i for i, word in enumerate(words))
+
+
+def _counting_words(inputs_count: int, start: int, width: int) -> list:
+    """
+    Get input words for 'width' (a power of two) consecutive input vectors starting with 'start', where every vector
+    is the binary representation of its number
+    """
+    mask = (1 << width) - 1
+    words = []
+    for i in range(inputs_count):
+        period = 1 << i
+        if period < width:
+            # Blocks of 'period' zeros and 'period' ones
+            repunit = mask // ((1 << (2 * period)) - 1)
+            words.append(repunit * (((1 << period) - 1) << period))
+        else:
+            words.append(mask if (start >> i) & 1 else 0)
+    return words
+
+
+WORD_MIN_WIDTH = 1 << 6  # Minimum number of input vectors evaluated at once
+WORD_MAX_WIDTH = 1 << 16  # Maximum number of input vectors evaluated at once
+WORDS_MEMORY_LIMIT = 1 << 30  # Maximum total number of bits in the words of all nodes of a circuit
+EXHAUSTIVE_INPUTS_LIMIT = 24  # Circuits with at most this number of inputs are checked on all input vectors
+RANDOM_VECTORS = 1 << 12  # Number of random input vectors to check larger circuits on
+
+
+def _word_width(table: GateTable) -> int:
+    """
+    Choose the number of input vectors evaluated at once, so that the words of all nodes fit in WORDS_MEMORY_LIMIT
+    """
+    width = WORD_MIN_WIDTH
+    while width < WORD_MAX_WIDTH and width * 2 * table.nodes_count <= WORDS_MEMORY_LIMIT:
+        width *= 2
+    return width
+
+
+def _input_chunks(table: GateTable, inputs_count: int) -> tuple:
+    """
+    Choose input vectors to check a circuit on: all of them for at most EXHAUSTIVE_INPUTS_LIMIT inputs, at least
+    RANDOM_VECTORS random ones otherwise
+    :return: (number of vectors, word width, iterable of lists of input words)
+    """
+    width = _word_width(table)
+
+    if inputs_count <= EXHAUSTIVE_INPUTS_LIMIT:
+        vectors_count = 1 << inputs_count
+        width = min(vectors_count, width)
+        chunks = (_counting_words(inputs_count, start, width) for start in range(0, vectors_count, width))
+    else:
+        words_count = (RANDOM_VECTORS + width - 1) // width
+        vectors_count = words_count * width
+        chunks = ([random.getrandbits(width) for _ in range(inputs_count)] for _ in range(words_count))
+
+    return vectors_count, width, chunks
+
+
+def check_2_3_circuit(table: GateTable, n: int) -> tuple:
+    """
+    Check the netlist of a 2-3 trick for n-digit numbers: for every input vector the two (n + 1)-digit output numbers
+    must add up to a + b + c. Circuits with at most EXHAUSTIVE_INPUTS_LIMIT inputs are checked on all input vectors,
+    larger ones on at least RANDOM_VECTORS random vectors
+    :return: (number of checked vectors, mismatch), where 'mismatch' is None or (a, b, c, upper, lower) for a wrong
+    input vector
+    """
+    vectors_count, width, chunks = _input_chunks(table, 3 * n)
+
+    mask = (1 << width) - 1
+    for input_words in chunks:
+        output_words = simulate(table, input_words, mask)
+        mismatch = _find_mismatch(input_words, output_words, n, mask)
+        if mismatch != 0:
+            bit = (mismatch & -mismatch).bit_length() - 1
+            return vectors_count, (
+                _decode_vector(input_words[:n], bit),
+                _decode_vector(input_words[n:2 * n], bit),
+                _decode_vector(input_words[2 * n:3 * n], bit),
+                _decode_vector(output_words[:n + 1], bit),
+                _decode_vector(output_words[n + 1:2 * (n + 1)], bit),
+            )
+
+    return vectors_count, None
+
+
+def check_adder_circuit(table: GateTable, k: int, n: int) -> tuple:
+    """
+    Check the netlist of an adder of k n-digit numbers: for every input vector the output number must be the sum of
+    the inputs. Input vectors are chosen as by check_2_3_circuit
+    :return: (number of checked vectors, mismatch), where 'mismatch' is None or (operands, sum) for a wrong input
+    vector
+    """
+    vectors_count, width, chunks = _input_chunks(table, k * n)
+
+    mask = (1 << width) - 1
+    for input_words in chunks:
+        output_words = simulate(table, input_words, mask)
+        expected = []
+        for i in range(k):
+            expected = _add_words(expected, input_words[i * n:(i + 1) * n], mask)
+        mismatch = _difference_words(expected, output_words, mask)
+        if mismatch != 0:
+            bit = (mismatch & -mismatch).bit_length() - 1
+            return vectors_count, (
+                [_decode_vector(input_words[i * n:(i + 1) * n], bit) for i in range(k)],
+                _decode_vector(output_words, bit),
+            )
+
+    return vectors_count, None
+
+
+if __name__ == '__main__':
+    main()
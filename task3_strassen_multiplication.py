@@ -1,6 +1,17 @@
 #!/usr/bin/env python3
 
-import math
+import itertools
+import operator
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class Int9:
@@ -29,12 +40,534 @@ class Int9:
         return 'Int9({})'.format(self.n)
 
 
+LAZY_REDUCTION_LIMIT = 2 ** 62  # Matrix values are reduced modulo 9 only when they may exceed this limit
+
+STRASSEN_CUTOFF = 64  # Matrixes of this size or smaller are multiplied classically. See calibrate_strassen_cutoff()
+CLASSICAL_BLOCK_SIZE = 64  # Size of a block of columns processed at once by the classical multiplication
+
+# A view of a square block of a matrix stored in a row-major array: a tuple (values, offset, stride), where 'offset' is
+# the index of the upper left element in 'values' and 'stride' is the length of a row of the underlying matrix
+
+
+def _view_row(view: tuple, i: int, n: int) -> array:
+    values, offset, stride = view
+    start = offset + i * stride
+    return values[start:start + n]
+
+
+def _combine_views(a: tuple, b: tuple, n: int, op) -> tuple:
+    """
+    Apply 'op' to every pair of elements of views 'a' and 'b' of size 'n'
+    :return: a view of a new compact array
+    """
+    result = array('q')
+    for i in range(n):
+        result.extend(map(op, _view_row(a, i, n), _view_row(b, i, n)))
+    return result, 0, n
+
+
+def _combine_views_into(a: tuple, b: tuple, n: int, op, out: tuple):
+    """
+    Apply 'op' to every pair of elements of views 'a' and 'b' of size 'n', writing the result into the view 'out'
+    """
+    out_values, out_offset, out_stride = out
+    for i in range(n):
+        start = out_offset + i * out_stride
+        out_values[start:start + n] = array('q', map(op, _view_row(a, i, n), _view_row(b, i, n)))
+
+
+def _reduced_view(view: tuple, n: int) -> tuple:
+    """
+    Copy a view of size 'n', reducing its values modulo 9
+    :return: a view of a new compact array
+    """
+    result = array('q')
+    for i in range(n):
+        result.extend(map((9).__rmod__, _view_row(view, i, n)))
+    return result, 0, n
+
+
+def _numpy_view(view: tuple, n: int):
+    """
+    Get a 2-dimensional NumPy array sharing memory with a view of size 'n'
+    """
+    values, offset, stride = view
+    flat = numpy.frombuffer(values, dtype=numpy.int64)[offset:offset + (n - 1) * stride + n]
+    return numpy.lib.stride_tricks.as_strided(flat, shape=(n, n), strides=(stride * 8, 8))
+
+
+def _classical_mul(a: tuple, b: tuple, n: int, out: tuple):
+    """
+    Multiply views 'a' and 'b' of size 'n' by the classical algorithm, processing CLASSICAL_BLOCK_SIZE columns of 'b' at
+    once, and write the product into the view 'out'
+    """
+    if numpy is not None:
+        a_array = _numpy_view(a, n)
+        b_array = _numpy_view(b, n)
+        out_array = _numpy_view(out, n)
+        out_array[:, :] = 0
+        for k in range(0, n, CLASSICAL_BLOCK_SIZE):
+            for j in range(0, n, CLASSICAL_BLOCK_SIZE):
+                a_block = a_array[:, k:k + CLASSICAL_BLOCK_SIZE]
+                b_block = b_array[k:k + CLASSICAL_BLOCK_SIZE, j:j + CLASSICAL_BLOCK_SIZE]
+                out_array[:, j:j + CLASSICAL_BLOCK_SIZE] += a_block @ b_block
+        return
+
+    a_rows = [_view_row(a, i, n) for i in range(n)]
+    b_values, b_offset, b_stride = b
+    out_values, out_offset, out_stride = out
+    for j_start in range(0, n, CLASSICAL_BLOCK_SIZE):
+        j_end = min(j_start + CLASSICAL_BLOCK_SIZE, n)
+        b_columns = [
+            b_values[b_offset + j:b_offset + j + n * b_stride:b_stride] for j in range(j_start, j_end)
+        ]
+        for i in range(n):
+            a_row = a_rows[i]
+            start = out_offset + i * out_stride
+            out_values[start + j_start:start + j_end] = array(
+                'q', [sum(map(operator.mul, a_row, b_column)) for b_column in b_columns]
+            )
+
+
+def _product_bound(n: int, a_bound: int, b_bound: int, cutoff: int) -> int:
+    """
+    Calculate an upper bound of absolute values of all intermediate values of _multiply_views
+    """
+    # Every Strassen-Winograd level multiplies sums of up to 4 quadrants and sums up to 4 products. A peeled row and
+    # column of an odd-sized matrix add one more product to every element
+    full_bound = n * a_bound * b_bound
+    multiplier = 1
+    peeled = 0
+    while n > cutoff:
+        if n % 2 != 0:
+            n -= 1
+            peeled += multiplier * a_bound * b_bound
+            continue
+        n //= 2
+        a_bound *= 4
+        b_bound *= 4
+        multiplier *= 4
+    return max(multiplier * n * a_bound * b_bound + peeled, full_bound)
+
+
+def _quadrant_views(view: tuple, h: int) -> tuple:
+    """
+    Split a view into views of its four quadrants of size 'h'
+    :return: (upper left, upper right, lower left, lower right)
+    """
+    values, offset, stride = view
+    return (
+        view,
+        (values, offset + h, stride),
+        (values, offset + h * stride, stride),
+        (values, offset + h * stride + h, stride),
+    )
+
+
+def _winograd_operands(a: tuple, a_bound: int, b: tuple, b_bound: int, h: int, indexes) -> list:
+    """
+    Calculate operands of Strassen-Winograd products of views 'a' and 'b' of size 2 * 'h'. Only the sums required by
+    the products with the given 'indexes' (0 to 6) are calculated, each of them once
+    :return: a list of (x, x_bound, y, y_bound) for every index, where 'x' and 'y' are views of size 'h'
+    """
+    add = operator.add
+    sub = operator.sub
+    a11, a12, a21, a22 = _quadrant_views(a, h)
+    b11, b12, b21, b22 = _quadrant_views(b, h)
+
+    sums = {}
+
+    def memo(name: str, calculate):
+        if name not in sums:
+            sums[name] = calculate()
+        return sums[name]
+
+    def s1():
+        return memo('s1', lambda: _combine_views(a21, a22, h, add))
+
+    def s2():
+        return memo('s2', lambda: _combine_views(s1(), a11, h, sub))
+
+    def t1():
+        return memo('t1', lambda: _combine_views(b12, b11, h, sub))
+
+    def t2():
+        return memo('t2', lambda: _combine_views(b22, t1(), h, sub))
+
+    operands = (
+        lambda: (a11, a_bound, b11, b_bound),
+        lambda: (a12, a_bound, b21, b_bound),
+        lambda: (_combine_views(a12, s2(), h, sub), 4 * a_bound, b22, b_bound),
+        lambda: (a22, a_bound, _combine_views(t2(), b21, h, sub), 4 * b_bound),
+        lambda: (s1(), 2 * a_bound, t1(), 2 * b_bound),
+        lambda: (s2(), 3 * a_bound, t2(), 3 * b_bound),
+        lambda: (_combine_views(a11, a21, h, sub), 2 * a_bound, _combine_views(b22, b12, h, sub), 2 * b_bound),
+    )
+    return [operands[i]() for i in indexes]
+
+
+def _winograd_combine(products: list, h: int, out: tuple) -> int:
+    """
+    Combine 7 Strassen-Winograd 'products', given as a list of (view, bound), into the view 'out' of size 2 * 'h'
+    :return: an upper bound of absolute values of the result
+    """
+    add = operator.add
+    sub = operator.sub
+
+    # Every result quadrant is a sum of up to 4 products
+    if 4 * max(bound for _, bound in products) > LAZY_REDUCTION_LIMIT:
+        products = [(_reduced_view(product, h), 8) for product, _ in products]
+    (p1, p1_bound), (p2, p2_bound), (p3, p3_bound), (p4, p4_bound), (p5, p5_bound), (p6, p6_bound), (p7, p7_bound) = \
+        products
+
+    c11, c12, c21, c22 = _quadrant_views(out, h)
+
+    u2 = _combine_views(p1, p6, h, add)
+    u3 = _combine_views(u2, p7, h, add)
+    u4 = _combine_views(u2, p5, h, add)
+
+    _combine_views_into(p1, p2, h, add, c11)
+    _combine_views_into(u4, p3, h, add, c12)
+    _combine_views_into(u3, p4, h, sub, c21)
+    _combine_views_into(u3, p5, h, add, c22)
+
+    return max(
+        p1_bound + p2_bound,
+        p1_bound + p6_bound + p5_bound + p3_bound,
+        p1_bound + p6_bound + p7_bound + p4_bound,
+        p1_bound + p6_bound + p7_bound + p5_bound,
+    )
+
+
+class ScratchArena:
+    """
+    A preallocated scratch buffer for temporary matrixes of the Strassen-Winograd algorithm. Temporaries are allocated
+    and released in stack order; 'peak' is the largest number of elements in use at once
+    """
+    def __init__(self, size: int):
+        self.values = array('q', bytes(8 * size))
+        self.size = size
+        self.top = 0
+        self.peak = 0
+
+    def allocate(self, n: int) -> tuple:
+        """
+        Allocate a temporary matrix of size 'n'
+        :return: a view of the allocated matrix
+        """
+        offset = self.top
+        if offset + n * n > self.size:
+            raise Exception("Scratch arena of {} elements is exhausted. Requested: {}".format(self.size, n * n))
+        self.top += n * n
+        self.peak = max(self.peak, self.top)
+        return self.values, offset, n
+
+    def release(self, mark: int):
+        """
+        Release all temporaries allocated after 'top' was equal to 'mark'
+        """
+        self.top = mark
+
+    @property
+    def peak_bytes(self) -> int:
+        return 8 * self.peak
+
+
+def scratch_size(n: int, cutoff: int = None) -> int:
+    """
+    Calculate the number of elements of a ScratchArena required to multiply matrixes of size 'n'
+    """
+    if cutoff is None:
+        cutoff = STRASSEN_CUTOFF
+
+    size = 0
+    while n > cutoff:
+        if n % 2 != 0:
+            n -= 1
+            continue
+        n //= 2
+        size += 2 * n * n
+    return size
+
+
+def _multiply_scheduled(a: tuple, a_bound: int, b: tuple, b_bound: int, n: int, out: tuple, cutoff: int,
+                        arena: ScratchArena) -> int:
+    """
+    Conduct a Strassen-Winograd step for views 'a' and 'b' of an even size 'n', using the quadrants of 'out' and two
+    temporaries from the 'arena' as the only workspace (the schedule of Boyer, Dumas, Pernet and Zhou)
+    :return: an upper bound of absolute values of the product
+    """
+    add = operator.add
+    sub = operator.sub
+    h = n // 2
+
+    a11, a12, a21, a22 = _quadrant_views(a, h)
+    b11, b12, b21, b22 = _quadrant_views(b, h)
+    c11, c12, c21, c22 = _quadrant_views(out, h)
+
+    mark = arena.top
+    x = arena.allocate(h)
+    y = arena.allocate(h)
+
+    _combine_views_into(a11, a21, h, sub, x)  # S3
+    _combine_views_into(b22, b12, h, sub, y)  # T3
+    p7_bound = _multiply_views(x, 2 * a_bound, y, 2 * b_bound, h, c21, cutoff, arena)
+    _combine_views_into(a21, a22, h, add, x)  # S1
+    _combine_views_into(b12, b11, h, sub, y)  # T1
+    p5_bound = _multiply_views(x, 2 * a_bound, y, 2 * b_bound, h, c22, cutoff, arena)
+    _combine_views_into(x, a11, h, sub, x)  # S2
+    _combine_views_into(b22, y, h, sub, y)  # T2
+    p6_bound = _multiply_views(x, 3 * a_bound, y, 3 * b_bound, h, c12, cutoff, arena)
+    _combine_views_into(a12, x, h, sub, x)  # S4
+    p3_bound = _multiply_views(x, 4 * a_bound, b22, b_bound, h, c11, cutoff, arena)
+    p1_bound = _multiply_views(a11, a_bound, b11, b_bound, h, x, cutoff, arena)
+
+    _combine_views_into(x, c12, h, add, c12)  # U2 = P1 + P6
+    _combine_views_into(c12, c21, h, add, c21)  # U3 = U2 + P7
+    _combine_views_into(c12, c22, h, add, c12)  # U4 = U2 + P5
+    _combine_views_into(c21, c22, h, add, c22)  # U7 = U3 + P5
+    _combine_views_into(c12, c11, h, add, c12)  # U5 = U4 + P3
+    _combine_views_into(y, b21, h, sub, y)  # T4
+    p4_bound = _multiply_views(a22, a_bound, y, 4 * b_bound, h, c11, cutoff, arena)
+    _combine_views_into(c21, c11, h, sub, c21)  # U6 = U3 - P4
+    p2_bound = _multiply_views(a12, a_bound, b21, b_bound, h, c11, cutoff, arena)
+    _combine_views_into(x, c11, h, add, c11)  # U1 = P1 + P2
+
+    arena.release(mark)
+
+    return max(
+        p1_bound + p2_bound,
+        p1_bound + p6_bound + p5_bound + p3_bound,
+        p1_bound + p6_bound + p7_bound + p4_bound,
+        p1_bound + p6_bound + p7_bound + p5_bound,
+    )
+
+
+def _multiply_views(a: tuple, a_bound: int, b: tuple, b_bound: int, n: int, out: tuple, cutoff: int,
+                    arena: ScratchArena = None) -> int:
+    """
+    Multiply views 'a' and 'b' of size 'n' and write the product into the view 'out', which must not overlap them.
+    Matrixes larger than 'cutoff' are multiplied by the Strassen-Winograd algorithm (7 multiplications and 15
+    additions), whose quadrants are views of the operands; smaller ones are multiplied classically
+    :param a_bound: an upper bound of absolute values of 'a'
+    :param b_bound: an upper bound of absolute values of 'b'
+    :param arena: a ScratchArena to take temporary matrixes from. If it is not given, the temporaries are allocated
+    separately
+    :return: an upper bound of absolute values of the product
+    """
+    if _product_bound(n, a_bound, b_bound, cutoff) > LAZY_REDUCTION_LIMIT:
+        if a_bound > 8:
+            a = _reduced_view(a, n)
+            a_bound = 8
+        if b_bound > 8:
+            b = _reduced_view(b, n)
+            b_bound = 8
+
+    if n <= cutoff:
+        _classical_mul(a, b, n, out)
+        return n * a_bound * b_bound
+
+    if n % 2 != 0:
+        return _multiply_peeled(a, a_bound, b, b_bound, n, out, cutoff, arena)
+
+    if arena is not None and _product_bound(n, a_bound, b_bound, cutoff) <= LAZY_REDUCTION_LIMIT:
+        return _multiply_scheduled(a, a_bound, b, b_bound, n, out, cutoff, arena)
+
+    h = n // 2
+    products = []
+    for x, x_bound, y, y_bound in _winograd_operands(a, a_bound, b, b_bound, h, range(7)):
+        product = (array('q', bytes(8 * h * h)), 0, h)
+        products.append((product, _multiply_views(x, x_bound, y, y_bound, h, product, cutoff)))
+
+    return _winograd_combine(products, h, out)
+
+
+def _multiply_peeled(a: tuple, a_bound: int, b: tuple, b_bound: int, n: int, out: tuple, cutoff: int,
+                     arena: ScratchArena = None) -> int:
+    """
+    Multiply views 'a' and 'b' of an odd size 'n' by dynamic peeling: the leading blocks of size n - 1 are multiplied
+    by _multiply_views, and the last row and column are accounted for separately in O(n^2)
+    :return: an upper bound of absolute values of the product
+    """
+    m = n - 1
+    add = operator.add
+    mul = operator.mul
+
+    a_values, a_offset, a_stride = a
+    b_values, b_offset, b_stride = b
+    out_values, out_offset, out_stride = out
+
+    leading_bound = _multiply_views(a, a_bound, b, b_bound, m, out, cutoff, arena)
+
+    a_column = [a_values[a_offset + i * a_stride + m] for i in range(m)]
+    a_row = _view_row((a_values, a_offset + m * a_stride, a_stride), 0, m)
+    a_corner = a_values[a_offset + m * a_stride + m]
+    b_column = [b_values[b_offset + i * b_stride + m] for i in range(m)]
+    b_row = _view_row((b_values, b_offset + m * b_stride, b_stride), 0, m)
+    b_corner = b_values[b_offset + m * b_stride + m]
+
+    # The leading block: a rank-one update by the last column of 'a' and the last row of 'b'
+    for i in range(m):
+        start = out_offset + i * out_stride
+        out_values[start:start + m] = array(
+            'q', map(add, out_values[start:start + m], map(a_column[i].__mul__, b_row))
+        )
+
+    # The last column
+    for i in range(m):
+        out_values[out_offset + i * out_stride + m] = (
+            sum(map(mul, _view_row(a, i, m), b_column)) + a_column[i] * b_corner
+        )
+
+    # The last row
+    last_row = [a_corner * v for v in b_row]
+    for k in range(m):
+        last_row = list(map(add, last_row, map(a_row[k].__mul__, _view_row(b, k, m))))
+    start = out_offset + m * out_stride
+    out_values[start:start + m] = array('q', last_row)
+    out_values[start + m] = sum(map(mul, a_row, b_column)) + a_corner * b_corner
+
+    return max(leading_bound + a_bound * b_bound, n * a_bound * b_bound)
+
+
+PARALLEL_WORKERS = 0  # Number of processes computing Strassen products in parallel; 0 disables the parallel mode
+PARALLEL_DEPTH = 1  # Number of Strassen levels whose products are distributed among processes (7 ** depth tasks)
+
+_parallel_pool = None
+
+
+def _get_parallel_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Get a pool of 'workers' processes, reusing the previously created one if it has the same size
+    """
+    global _parallel_pool
+
+    if _parallel_pool is not None and _parallel_pool[0] != workers:
+        _parallel_pool[1].shutdown()
+        _parallel_pool = None
+    if _parallel_pool is None:
+        _parallel_pool = (workers, ProcessPoolExecutor(max_workers=workers))
+    return _parallel_pool[1]
+
+
+def _parallel_product(shared_name: str, n: int, a_bound: int, b_bound: int, path: tuple, slot: int, cutoff: int) -> int:
+    """
+    Calculate a Strassen-Winograd product in a worker process. The operands 'a' and 'b' of size 'n' and the slots for
+    products are stored in a shared memory block 'shared_name'
+    :param path: indexes of the products to descend into on every parallel level
+    :param slot: index of the first element of the product in the shared memory block
+    :return: an upper bound of absolute values of the product
+    """
+    shared = SharedMemory(name=shared_name)
+    values = shared.buf.cast('q')
+    try:
+        x, x_bound, y, y_bound = (values, 0, n), a_bound, (values, n * n, n), b_bound
+        size = n
+        for index in path:
+            size //= 2
+            x, x_bound, y, y_bound = _winograd_operands(x, x_bound, y, y_bound, size, [index])[0]
+        arena = ScratchArena(scratch_size(size, cutoff))
+        return _multiply_views(x, x_bound, y, y_bound, size, (values, slot, size), cutoff, arena)
+    finally:
+        x = y = None
+        values.release()
+        shared.close()
+
+
+def _multiply_parallel(a: tuple, a_bound: int, b: tuple, b_bound: int, n: int, out: tuple, cutoff: int,
+                       workers: int, depth: int) -> int:
+    """
+    Multiply compact views 'a' and 'b' of size 'n' like _multiply_views, calculating the Strassen-Winograd products of
+    the first 'depth' levels in a pool of 'workers' processes. The operands and the products are passed through
+    shared memory
+    :return: an upper bound of absolute values of the product
+    """
+    while depth > 0 and (n % (1 << depth) != 0 or (n >> (depth - 1)) <= cutoff):
+        depth -= 1
+    if depth == 0:
+        return _multiply_views(a, a_bound, b, b_bound, n, out, cutoff, ScratchArena(scratch_size(n, cutoff)))
+
+    if _product_bound(n, a_bound, b_bound, cutoff) > LAZY_REDUCTION_LIMIT:
+        a = _reduced_view(a, n)
+        a_bound = 8
+        b = _reduced_view(b, n)
+        b_bound = 8
+
+    size = n >> depth
+    paths = list(itertools.product(range(7), repeat=depth))
+    shared = SharedMemory(create=True, size=8 * (2 * n * n + len(paths) * size * size))
+    values = shared.buf.cast('q')
+    try:
+        values[0:n * n] = a[0]
+        values[n * n:2 * n * n] = b[0]
+
+        pool = _get_parallel_pool(workers)
+        futures = {}
+        for i, path in enumerate(paths):
+            slot = 2 * n * n + i * size * size
+            future = pool.submit(_parallel_product, shared.name, n, a_bound, b_bound, path, slot, cutoff)
+            futures[path] = ((values, slot, size), future)
+        results = {path: (view, future.result()) for path, (view, future) in futures.items()}
+
+        # Combine the products level by level, from the deepest one
+        for level in range(depth, 0, -1):
+            h = n >> level
+            combined = {}
+            for prefix in itertools.product(range(7), repeat=level - 1):
+                level_out = out if level == 1 else (array('q', bytes(8 * 4 * h * h)), 0, 2 * h)
+                combined[prefix] = (
+                    level_out, _winograd_combine([results[prefix + (index,)] for index in range(7)], h, level_out)
+                )
+            results = combined
+
+        return results[()][1]
+    finally:
+        results = futures = None
+        values.release()
+        shared.close()
+        shared.unlink()
+
+
+def calibrate_strassen_cutoff(max_size: int = 512) -> int:
+    """
+    Measure the time of the classical multiplication and of a single Strassen-Winograd step for power-of-two sizes up to
+    'max_size', and set STRASSEN_CUTOFF to the largest size which is still faster to multiply classically
+    :return: the new STRASSEN_CUTOFF
+    """
+    global STRASSEN_CUTOFF
+
+    cutoff = max_size
+    n = 2
+    while n <= max_size:
+        a = (array('q', [random.randint(0, 8) for _ in range(n * n)]), 0, n)
+        b = (array('q', [random.randint(0, 8) for _ in range(n * n)]), 0, n)
+        out = (array('q', bytes(8 * n * n)), 0, n)
+
+        time_start = time.perf_counter()
+        _multiply_views(a, 8, b, 8, n, out, n)
+        time_classical = time.perf_counter() - time_start
+
+        time_start = time.perf_counter()
+        _multiply_views(a, 8, b, 8, n, out, n // 2)
+        time_strassen = time.perf_counter() - time_start
+
+        if time_strassen < time_classical:
+            cutoff = n // 2
+            break
+        n *= 2
+
+    STRASSEN_CUTOFF = cutoff
+    return cutoff
+
+
 class Mat9:
     """
     A matrix over Z9 (module 9) field.
-    Several limitations apply to the matrix structure:
-    * Matrix must be a square matrix
-    * Matrix size must be a power of two
+    Matrix must be a square matrix.
+
+    The matrix is stored as a contiguous row-major array of 64-bit integers 'values'. The values are congruent modulo 9
+    to the matrix elements, but are not necessarily reduced: 'bound' is an upper limit of their absolute values, and the
+    reduction is only conducted when an operation could exceed LAZY_REDUCTION_LIMIT
     """
     def __init__(self, m: list):
         if type(m[0][0]) != Int9:
@@ -42,8 +575,54 @@ class Mat9:
         if len(m) != len(m[0]):
             raise Exception("Non-square matrixes are not supported. Provided matrix: {}".format(m))
 
-        self.m = m
         self.L = len(m)
+        self.values = array('q', [int(v) for row in m for v in row])
+        self.bound = 8
+
+    @staticmethod
+    def _from_values(values: array, size: int, bound: int):
+        """
+        Create a matrix of size 'size' from a row-major array 'values', whose absolute values do not exceed 'bound'
+        """
+        result = Mat9.__new__(Mat9)
+        result.L = size
+        result.values = values
+        result.bound = bound
+        return result
+
+    @staticmethod
+    def zeros(size: int):
+        return Mat9._from_values(array('q', bytes(8 * size * size)), size, 0)
+
+    @staticmethod
+    def identity(size: int):
+        values = array('q', bytes(8 * size * size))
+        for i in range(size):
+            values[i * size + i] = 1
+        return Mat9._from_values(values, size, 1)
+
+    @property
+    def m(self) -> list:
+        """
+        A 2-dimensional list of Int9 elements of the matrix
+        """
+        return [[Int9(v) for v in self.values[i * self.L:(i + 1) * self.L]] for i in range(self.L)]
+
+    def _reduce(self):
+        """
+        Reduce the stored values modulo 9 in place
+        """
+        if self.bound > 8:
+            self.values = array('q', map((9).__rmod__, self.values))
+            self.bound = 8
+
+    def _prepare_operands(self, other, result_bound: int):
+        """
+        Reduce the operands if the 'result_bound' of an operation on them exceeds LAZY_REDUCTION_LIMIT
+        """
+        if result_bound > LAZY_REDUCTION_LIMIT:
+            self._reduce()
+            other._reduce()
 
     def __add__(self, other):
         if self.L != other.L:
@@ -51,7 +630,10 @@ class Mat9:
                 "__add__ is called on matrixes of different size. Arguments: {}; {}".format(self.m, other.m)
             )
 
-        return Mat9([[self.m[i1][i2] + other.m[i1][i2] for i2 in range(self.L)] for i1 in range(self.L)])
+        self._prepare_operands(other, self.bound + other.bound)
+        return Mat9._from_values(
+            array('q', map(operator.add, self.values, other.values)), self.L, self.bound + other.bound
+        )
 
     def __sub__(self, other):
         if self.L != other.L:
@@ -59,77 +641,10 @@ class Mat9:
                 "__sub__ is called on matrixes of different size. Arguments: {}; {}".format(self.m, other.m)
             )
 
-        return Mat9([[self.m[i1][i2] - other.m[i1][i2] for i2 in range(self.L)] for i1 in range(self.L)])
-
-    @staticmethod
-    def _mul2(a, b):
-        """
-        Calculate __mul__ for matrixes of size 2
-        :return: A Mat9 - product of a and b
-        """
-        a11 = a.m[0][0]
-        a12 = a.m[0][1]
-        a21 = a.m[1][0]
-        a22 = a.m[1][1]
-
-        b11 = b.m[0][0]
-        b12 = b.m[0][1]
-        b21 = b.m[1][0]
-        b22 = b.m[1][1]
-
-        m1 = (a11 + a22) * (b11 + b22)
-        m2 = (a21 + a22) * b11
-        m3 = a11 * (b12 - b22)
-        m4 = a22 * (b21 - b11)
-        m5 = (a11 + a12) * b22
-        m6 = (a21 - a11) * (b11 + b12)
-        m7 = (a12 - a22) * (b21 + b22)
-
-        c11 = m1 + m4 - m5 + m7
-        c12 = m3 + m5
-        c21 = m2 + m4
-        c22 = m1 - m2 + m3 + m6
-
-        return Mat9([[c11, c12], [c21, c22]])
-
-    @staticmethod
-    def _mul(a, b):
-        """
-        Calculate __mul__ using Strassen algorithm
-        :return: A Mat9 - product of a and b
-        """
-        l_div = a.L // 2
-
-        a11 = Mat9([a.m[i][:l_div] for i in range(0, l_div)])
-        a12 = Mat9([a.m[i][l_div:] for i in range(0, l_div)])
-        a21 = Mat9([a.m[i][:l_div] for i in range(l_div, a.L)])
-        a22 = Mat9([a.m[i][l_div:] for i in range(l_div, a.L)])
-
-        b11 = Mat9([b.m[i][:l_div] for i in range(0, l_div)])
-        b12 = Mat9([b.m[i][l_div:] for i in range(0, l_div)])
-        b21 = Mat9([b.m[i][:l_div] for i in range(l_div, b.L)])
-        b22 = Mat9([b.m[i][l_div:] for i in range(l_div, b.L)])
-
-        m1 = (a11 + a22) * (b11 + b22)
-        m2 = (a21 + a22) * b11
-        m3 = a11 * (b12 - b22)
-        m4 = a22 * (b21 - b11)
-        m5 = (a11 + a12) * b22
-        m6 = (a21 - a11) * (b11 + b12)
-        m7 = (a12 - a22) * (b21 + b22)
-
-        c11 = m1 + m4 - m5 + m7
-        c12 = m3 + m5
-        c21 = m2 + m4
-        c22 = m1 - m2 + m3 + m6
-
-        for i in range(l_div):
-            c11.m[i].extend(c12.m[i])
-            c21.m[i].extend(c22.m[i])
-        c11.m.extend(c21.m)
-        c11.L = c11.L * 2
-
-        return c11
+        self._prepare_operands(other, self.bound + other.bound)
+        return Mat9._from_values(
+            array('q', map(operator.sub, self.values, other.values)), self.L, self.bound + other.bound
+        )
 
     def __mul__(self, other):
         if self.L != other.L:
@@ -137,26 +652,97 @@ class Mat9:
                 "__mul__ is called on matrixes of different size. Arguments: {}; {}".format(self.m, other.m)
             )
 
-        if self.L == 1:
-            return Mat9([[self.m[0][0] * other.m[0][0]]])
+        result = Mat9.zeros(self.L)
+        if PARALLEL_WORKERS > 0:
+            result.bound = _multiply_parallel(
+                (self.values, 0, self.L), self.bound, (other.values, 0, other.L), other.bound, self.L,
+                (result.values, 0, self.L), STRASSEN_CUTOFF, PARALLEL_WORKERS, PARALLEL_DEPTH
+            )
+        else:
+            multiply_into(self, other, result)
+        return result
 
-        if self.L == 2:
-            return Mat9._mul2(self, other)
+    def __pow__(self, power, modulo=None):
+        return matrix_power(self, power)
 
-        return Mat9._mul(self, other)
 
-    def __pow__(self, power, modulo=None):
-        if power == 0:
-            return Mat9([[Int9(1) if i == j else Int9(0) for i in range(self.L)] for j in range(self.L)])
+def multiply_into(a: Mat9, b: Mat9, out: Mat9, arena: ScratchArena = None) -> int:
+    """
+    Multiply matrixes 'a' and 'b' and write the product into the matrix 'out', which must be a different matrix of the
+    same size. All temporaries are taken from the 'arena'; if it is not given, an arena of scratch_size(a.L) elements
+    is allocated for this call
+    :return: the peak number of scratch elements in use during the multiplication
+    """
+    if a.L != b.L or a.L != out.L:
+        raise Exception("multiply_into is called on matrixes of different size: {}, {}, {}".format(a.L, b.L, out.L))
+    if out is a or out is b:
+        raise Exception("The output matrix of multiply_into must not be one of the operands")
+
+    a._prepare_operands(b, _product_bound(a.L, a.bound, b.bound, STRASSEN_CUTOFF))
 
-        if power == 1:
-            return self
+    if arena is None:
+        arena = ScratchArena(scratch_size(a.L))
+    out.bound = _multiply_views(
+        (a.values, 0, a.L), a.bound, (b.values, 0, b.L), b.bound, a.L, (out.values, 0, out.L), STRASSEN_CUTOFF, arena
+    )
+    return arena.peak
 
-        if power % 2 != 0:
-            return (self ** (power - 1)) * self
 
-        self_halfpow = self ** (power / 2)
-        return self_halfpow * self_halfpow
+def _power_window_size(power: int) -> int:
+    """
+    Choose the window size of the sliding-window exponentiation to the given 'power'
+    """
+    bits = power.bit_length()
+    if bits <= 8:
+        return 1
+    return max(1, bits.bit_length() - 2)
+
+
+def matrix_power(m: Mat9, power: int) -> Mat9:
+    """
+    Raise the matrix 'm' to the integer 'power' by iterative sliding-window exponentiation
+    """
+    if not isinstance(power, int) or power < 0:
+        raise Exception("Matrix power must be a non-negative integer. Provided power: {}".format(power))
+
+    if power == 0:
+        return Mat9.identity(m.L)
+
+    if power == 1:
+        return m
+
+    # Odd powers m, m^3, ..., m^(2^window - 1)
+    window = _power_window_size(power)
+    odd_powers = [m]
+    if window > 1:
+        square = m * m
+        for _ in range((1 << (window - 1)) - 1):
+            odd_powers.append(odd_powers[-1] * square)
+
+    result = None
+    i = power.bit_length() - 1
+    while i >= 0:
+        if not (power >> i) & 1:
+            if result is not None:
+                result = result * result
+            i -= 1
+            continue
+
+        # Find the longest window [j, i] not longer than 'window' which ends with a set bit
+        j = max(i - window + 1, 0)
+        while not (power >> j) & 1:
+            j += 1
+        window_value = (power >> j) & ((1 << (i - j + 1)) - 1)
+
+        if result is not None:
+            for _ in range(i - j + 1):
+                result = result * result
+            result = result * odd_powers[window_value // 2]
+        else:
+            result = odd_powers[window_value // 2]
+        i = j - 1
+
+    return result
 
 
 def main():
@@ -165,18 +751,13 @@ def main():
         m.append(list(map(lambda n: Int9(n), list(map(int, input().split())))))
 
     m_size = len(m)
-    m_size_pow_2 = 2 ** int(math.ceil(math.log2(len(m))))
-    if m_size_pow_2 != m_size:
-        for i in range(m_size):
-            m[i].extend([Int9(0) for _ in range(m_size_pow_2 - m_size)])
-        m.extend([[Int9(0) for _ in range(m_size_pow_2)] for _ in range(m_size_pow_2 - m_size)])
 
     m9 = Mat9(m)
-    result_noncut = m9 ** m_size
+    result = matrix_power(m9, m_size).m
 
     result_printable = '\n'.join(
         [' '.join([
-            str(result_noncut.m[i][j]) for j in range(m_size)
+            str(result[i][j]) for j in range(m_size)
         ]) for i in range(m_size)]
     )
 
@@ -2,58 +2,25 @@
 
 import math
 import random
-import copy
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from multiprocessing.shared_memory import SharedMemory
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-class Float1997:
-    """
-    A float over Z1997 (module 1997) field
-    """
-    PRECISION_ROUND = 16
-
-    def __init__(self, n: float):
-        self.n = math.fmod(n, 1997.)
-
-    def __add__(self, other):
-        return Float1997(math.fsum((self.n, other.n)))
-
-    def __sub__(self, other):
-        return Float1997(math.fsum((self.n, -other.n)))
-
-    def __mul__(self, other):
-        return Float1997(self.n * other.n)
-
-    def __truediv__(self, other):
-        return Float1997(self.n / other.n)
-
-    def __float__(self):
-        return self.n
-
-    def __str__(self):
-        return str(self.n)
-
-    def __repr__(self):
-        return 'F1997({})'.format(self.n)
-
-    def __gt__(self, other):
-        return round(self.n, Float1997.PRECISION_ROUND) > round(other.n, Float1997.PRECISION_ROUND)
 
-    def __lt__(self, other):
-        return round(self.n, Float1997.PRECISION_ROUND) < round(other.n, Float1997.PRECISION_ROUND)
-
-    def __eq__(self, other):
-        return round(self.n, Float1997.PRECISION_ROUND) == round(other.n, Float1997.PRECISION_ROUND)
-
-    def __abs__(self):
-        if self < Float1997(0.0):
-            return Float1997(-self.n)
-        return self
+FIELD_PRIME = 2 ** 31 - 1  # The prime of the field of matrix elements; products of two elements fit in int64
 
 
 def _input_graph():
     """
-    Input a matrix from stdin
-    :return: an empty matrix and a set of pairs (int, int) of coordinates of edges
+    Input a graph from stdin
+    :return: the size of a graph matrix and a list of pairs (int, int) of coordinates of edges
     """
     n = int(input())
 
@@ -74,100 +41,521 @@ def _input_graph():
 
     graph_matrix_size = max_vertices_indexes[0] + 1
 
-    graph = [[Float1997(0.0) for _ in range(graph_matrix_size)] for _ in range(graph_matrix_size)]
-
-    return graph, edges
+    return graph_matrix_size, edges
 
 
-def _check_matrix_det_0(mat: list) -> bool:
+def _matrix_rank_modulo(mat: list, prime: int, stop=None) -> int:
     """
-    Check the given matrix has a determinant equal to 0, using the Gauss elimination method
+    Calculate the rank of the given matrix over the field of residues modulo 'prime' by the Gauss elimination method.
+    The matrix is modified
+    :param stop: None or a buffer; when its first byte becomes non-zero, the elimination is abandoned and a lower rank
+    is returned
     """
-    r = 0
-    c = 0
     matrix_size = len(mat)
-
-    zero_row_found = False
-
-    while r < matrix_size and c < matrix_size:
-        # Find the maximum row
-        r_i_max = None
-        r_i_max_value = Float1997(0.0)
-        for r_i in range(r, matrix_size):
-            r_i_abs = abs(mat[r_i][c])
-            if r_i_abs > r_i_max_value:
-                r_i_max = r_i
-                r_i_max_value = r_i_abs
-        # Check the maximum value is not zero
-        if r_i_max_value == Float1997(0.0):
-            column_zero_row_found = True
-            for r_i in range(r):
-                if not (mat[r_i][c] == Float1997(0.0)):
-                    column_zero_row_found = False
-                    break
-            if column_zero_row_found:
-                zero_row_found = True
-                break
-            c += 1
-            continue
-        # Swap the maximum and the current rows
-        if r_i_max != r:
-            r_tmp = mat[r_i_max]
-            mat[r_i_max] = mat[r]
-            mat[r] = r_tmp
-
-        # Divide all rows below
-        for r_i in range(r + 1, matrix_size):
-            multiplier = mat[r_i][c] / mat[r][c]
-            mat[r_i][c] = Float1997(0.0)
-            for c_i in range(c + 1, matrix_size):
-                mat[r_i][c_i] = mat[r_i][c_i] - (mat[r][c] * Float1997(multiplier))
-            # Check the resulting row is not a zero-row. If it is, set the flag variable and break from the cycle
-            row_zero_row_found = True
-            for c_i in range(c + 1, matrix_size):
-                if not (mat[r_i][c_i] == Float1997(0.0)):
-                    row_zero_row_found = False
-                    break
-            if row_zero_row_found:
-                zero_row_found = True
-                break
-
-        # Check if zero_row_found and increase iterator indexes
-        if zero_row_found:
+    rank = 0
+    for c in range(matrix_size):
+        if stop is not None and stop[0] != 0:
             break
-        r += 1
-        c += 1
+        pivot_r = next((r_i for r_i in range(rank, matrix_size) if mat[r_i][c] != 0), None)
+        if pivot_r is None:
+            continue
+        mat[rank], mat[pivot_r] = mat[pivot_r], mat[rank]
 
-    return zero_row_found
+        pivot_row = mat[rank]
+        pivot_inverse = pow(pivot_row[c], -1, prime)
+        for r_i in range(rank + 1, matrix_size):
+            row = mat[r_i]
+            if row[c] == 0:
+                continue
+            multiplier = row[c] * pivot_inverse % prime
+            row[c:] = [(x - multiplier * y) % prime for x, y in zip(row[c:], pivot_row[c:])]
+        rank += 1
+    return rank
 
 
 PRECISION = 8  # Do this number of repeated random iterator calculations before concluding the matrix' determinant is 0
 
 
-def _is_perfect_match_exists(standard_graph, edges) -> bool:
+STACKED_TRIALS_MEMORY_LIMIT = 1 << 28  # Maximum size in bytes of the matrices of the trials eliminated together
+
+
+def _numpy_any_nonsingular(stack, prime: int, stop=None) -> bool:
+    """
+    Check whether any of the given stacked int64 numpy matrices (a 3-D array) has a non-zero determinant modulo 'prime'
+    (prime < 2^31). All matrices are eliminated together; a matrix is dropped from the stack as soon as a column
+    without a pivot proves its determinant is zero, so the remaining matrices always have the same pivot positions.
+    The stack is modified
+    :param stop: as of _matrix_rank_modulo; an abandoned elimination returns False
+    """
+    matrix_size = stack.shape[1]
+    for c in range(matrix_size):
+        if stop is not None and stop[0] != 0:
+            return False
+        has_pivot = stack[:, c:, c] != 0
+        alive = has_pivot.any(axis=1)
+        if not alive.all():
+            stack = stack[alive]
+            has_pivot = has_pivot[alive]
+            if stack.shape[0] == 0:
+                return False
+
+        trials = numpy.arange(stack.shape[0])
+        pivot_rs = c + has_pivot.argmax(axis=1)
+        pivot_rows = stack[trials, pivot_rs, c:]
+        stack[trials, pivot_rs, c:] = stack[trials, c, c:]
+
+        pivot_inverses = numpy.array([pow(int(x), -1, prime) for x in pivot_rows[:, 0]], dtype=numpy.int64)
+        pivot_rows = pivot_rows * pivot_inverses[:, None] % prime
+        stack[trials, c, c:] = pivot_rows
+        below = stack[:, c + 1:, c:]
+        # Both factors are less than 2^31, so the products fit in int64
+        below -= below[:, :, :1] * pivot_rows[:, None, :] % prime
+        below %= prime
+    return True
+
+
+def _trial_nonsingular(matrix_size: int, edges: list, seed: int, stop=None) -> bool:
+    """
+    Run a single trial with its own random generator: form a "randomized" graph matrix and check whether its
+    determinant is non-zero
+    :param stop: as of _matrix_rank_modulo; an abandoned trial returns False
+    """
+    if numpy is not None:
+        mat = numpy.zeros((1, matrix_size, matrix_size), dtype=numpy.int64)
+        generator = numpy.random.default_rng(seed)
+        mat[0, [edge[0] for edge in edges], [edge[1] for edge in edges]] = \
+            generator.integers(1, FIELD_PRIME, size=len(edges))
+        return _numpy_any_nonsingular(mat, FIELD_PRIME, stop)
+
+    generator = random.Random(seed)
+    mat = [[0] * matrix_size for _ in range(matrix_size)]
+    for edge in edges:
+        mat[edge[0]][edge[1]] = generator.randrange(1, FIELD_PRIME)
+    return _matrix_rank_modulo(mat, FIELD_PRIME, stop) == matrix_size
+
+
+PARALLEL_WORKERS = 0  # Number of processes running randomized trials in parallel; 0 disables the parallel mode
+
+_parallel_pool = None
+
+
+def _get_parallel_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Get a pool of 'workers' processes, reusing the previously created one if it has the same size
+    """
+    global _parallel_pool
+
+    if _parallel_pool is not None and _parallel_pool[0] != workers:
+        _parallel_pool[1].shutdown()
+        _parallel_pool = None
+    if _parallel_pool is None:
+        _parallel_pool = (workers, ProcessPoolExecutor(max_workers=workers))
+    return _parallel_pool[1]
+
+
+def _parallel_trial(shared_name: str, matrix_size: int, edges: list, seed: int) -> bool:
+    """
+    Run a trial in a worker process. The first byte of the shared memory block 'shared_name' becomes non-zero as soon
+    as any trial succeeds; the trial is then abandoned
+    """
+    shared = SharedMemory(name=shared_name)
+    try:
+        nonsingular = _trial_nonsingular(matrix_size, edges, seed, shared.buf)
+        if nonsingular:
+            shared.buf[0] = 1
+        return nonsingular
+    finally:
+        shared.close()
+
+
+def _parallel_match_exists(matrix_size: int, edges: list, trials: int, workers: int) -> bool:
+    """
+    Run the trials of _randomized_match_exists in 'workers' processes, each with an independent seed. When a trial
+    succeeds, the queued trials are cancelled and the running ones are abandoned
+    """
+    pool = _get_parallel_pool(workers)
+    shared = SharedMemory(create=True, size=1)
+    futures = []
+    try:
+        shared.buf[0] = 0
+        futures = [
+            pool.submit(_parallel_trial, shared.name, matrix_size, edges, random.getrandbits(64))
+            for _ in range(trials)
+        ]
+        for future in as_completed(futures):
+            if future.result():
+                shared.buf[0] = 1
+                for other in futures:
+                    other.cancel()
+                return True
+        return False
+    finally:
+        shared.buf[0] = 1
+        # The trials which could not be cancelled must be over before the shared memory block is removed
+        wait(futures)
+        shared.close()
+        shared.unlink()
+
+
+def trials_for_error_probability(matrix_size: int, error_probability: float) -> int:
     """
-    Check if the given graph contains a perfect match
+    Get the number of trials after which a graph with a perfect match is reported to have none with at most the given
+    probability. By the Schwartz-Zippel lemma a trial fails with probability at most n / (FIELD_PRIME - 1), as the
+    determinant is a polynomial of degree n and the edge weights are chosen from FIELD_PRIME - 1 values
     """
-    perfect_match_exists = False
+    if not 0 < error_probability < 1:
+        raise Exception("Error probability {} is not in (0, 1)".format(error_probability))
+    trial_error = matrix_size / (FIELD_PRIME - 1)
+    if trial_error <= error_probability:
+        return 1
+    return math.ceil(math.log(error_probability) / math.log(trial_error))
 
-    for _ in range(PRECISION):
-        # Form a "randomized" graph according to Corollary and Schwartz-Zippel, as defined by Kozen
-        graph = copy.deepcopy(standard_graph)
+
+def _randomized_match_exists(matrix_size: int, edges: list, trials: int = None) -> bool:
+    """
+    Check if the given graph contains a perfect match by 'trials' trials (PRECISION if None). Every trial forms a
+    "randomized" graph matrix according to Corollary and Schwartz-Zippel, as defined by Kozen, and checks whether its
+    determinant is zero. The trials run in PARALLEL_WORKERS processes if it is not 0
+    """
+    if trials is None:
+        trials = PRECISION
+
+    if matrix_size == 0:
+        # The determinant of an empty matrix is 1: the empty graph has the empty perfect match
+        return True
+
+    if PARALLEL_WORKERS > 0:
+        return _parallel_match_exists(matrix_size, edges, trials, PARALLEL_WORKERS)
+
+    if numpy is not None:
+        rows = numpy.array([edge[0] for edge in edges], dtype=numpy.intp)
+        columns = numpy.array([edge[1] for edge in edges], dtype=numpy.intp)
+        generator = numpy.random.default_rng(random.getrandbits(64))
+
+        batch_size = max(1, min(trials, STACKED_TRIALS_MEMORY_LIMIT // (8 * matrix_size * matrix_size)))
+        stack = numpy.empty((batch_size, matrix_size, matrix_size), dtype=numpy.int64)
+        # A single trial almost always finds an existing match, so the first one is not stacked with the others
+        batch_start = 0
+        while batch_start < trials:
+            batch = stack[:1 if batch_start == 0 else min(batch_size, trials - batch_start)]
+            batch_start += len(batch)
+            batch.fill(0)
+            batch[:, rows, columns] = generator.integers(1, FIELD_PRIME, size=(len(batch), len(edges)))
+            if _numpy_any_nonsingular(batch, FIELD_PRIME):
+                return True
+        return False
+
+    # The rows are reused by all trials, the elimination only changes their contents and order
+    graph = [[0] * matrix_size for _ in range(matrix_size)]
+    zero_row = [0] * matrix_size
+    for _ in range(trials):
+        for row in graph:
+            row[:] = zero_row
         for edge in edges:
-            val = float(random.randint(-1997, 1997))
-            graph[edge[0]][edge[1]] = Float1997(val)
+            graph[edge[0]][edge[1]] = random.randrange(1, FIELD_PRIME)
+
+        if _matrix_rank_modulo(graph, FIELD_PRIME) == matrix_size:
+            return True
+
+    return False
+
+
+def _build_csr(matrix_size: int, edges: list) -> (array, array):
+    """
+    Build the adjacency of the left part of a graph in the compressed sparse row form
+    :return: (offsets, targets), where the right neighbours of the left vertex u are targets[offsets[u]:offsets[u + 1]]
+    """
+    offsets = array('q', [0]) * (matrix_size + 1)
+    for edge in edges:
+        offsets[edge[0] + 1] += 1
+    for u in range(matrix_size):
+        offsets[u + 1] += offsets[u]
+
+    targets = array('q', [0]) * len(edges)
+    positions = offsets[:-1]
+    for edge in edges:
+        targets[positions[edge[0]]] = edge[1]
+        positions[edge[0]] += 1
+    return offsets, targets
+
 
-        # Check if the randomized matrix determinant is zero
-        if not _check_matrix_det_0(graph):
-            perfect_match_exists = True
+def hopcroft_karp(matrix_size: int, offsets: array, targets: array) -> (array, array):
+    """
+    Find a maximum matching of a bipartite graph given in the CSR form by the Hopcroft-Karp algorithm in O(E sqrt(V))
+    :return: (match_left, match_right): the right vertex matched to each left vertex and vice versa, -1 if unmatched
+    """
+    match_left = array('q', [-1]) * matrix_size
+    match_right = array('q', [-1]) * matrix_size
+    infinity = matrix_size + 1
+
+    while True:
+        # Layer the left vertices by the length of the shortest alternating path from a free left vertex
+        distance = array('q', [infinity]) * matrix_size
+        queue = deque()
+        for u in range(matrix_size):
+            if match_left[u] == -1:
+                distance[u] = 0
+                queue.append(u)
+        free_right_distance = infinity
+        while queue:
+            u = queue.popleft()
+            if distance[u] >= free_right_distance:
+                continue
+            for i in range(offsets[u], offsets[u + 1]):
+                w = match_right[targets[i]]
+                if w == -1:
+                    free_right_distance = min(free_right_distance, distance[u] + 1)
+                elif distance[w] == infinity:
+                    distance[w] = distance[u] + 1
+                    queue.append(w)
+        if free_right_distance == infinity:
             break
 
-    return perfect_match_exists
+        # Augment along vertex-disjoint shortest paths, found by an iterative depth-first search over the layers
+        next_edge = offsets[:-1]
+        for root in range(matrix_size):
+            if match_left[root] != -1:
+                continue
+            path = [root]
+            while path:
+                u = path[-1]
+                if next_edge[u] == offsets[u + 1]:
+                    # A dead end: no augmenting path passes through u in this phase
+                    distance[u] = infinity
+                    path.pop()
+                    continue
+                v = targets[next_edge[u]]
+                next_edge[u] += 1
+                w = match_right[v]
+                if w == -1:
+                    if distance[u] + 1 != free_right_distance:
+                        continue
+                    # Flip the path: every left vertex on it is matched to the right vertex it was left by
+                    for u_i in reversed(path):
+                        v_i = targets[next_edge[u_i] - 1]
+                        match_right[v_i], match_left[u_i] = u_i, v_i
+                    for u_i in path:
+                        distance[u_i] = infinity
+                    break
+                if distance[w] == distance[u] + 1:
+                    path.append(w)
+
+    return match_left, match_right
+
+
+def _hall_violator(matrix_size: int, offsets: array, targets: array, match_left: array, match_right: array) -> list:
+    """
+    Find a set of left vertices with fewer neighbours than its size, given a maximum matching which is not perfect:
+    the left vertices reachable from a free left vertex by alternating paths. All their neighbours are matched (else
+    the matching could be augmented) to the reachable vertices other than the free one
+    """
+    root = next(u for u in range(matrix_size) if match_left[u] == -1)
+    reached = bytearray(matrix_size)
+    reached[root] = 1
+    stack = [root]
+    while stack:
+        u = stack.pop()
+        for i in range(offsets[u], offsets[u + 1]):
+            w = match_right[targets[i]]
+            if w != -1 and not reached[w]:
+                reached[w] = 1
+                stack.append(w)
+    return [u for u in range(matrix_size) if reached[u]]
+
+
+def find_perfect_match(matrix_size: int, edges: list) -> (list, list):
+    """
+    Find a perfect match of the given graph deterministically
+    :return: (match, violator): either 'match' is a list of the right vertices matched to the left vertices, or
+    'violator' is a list of left vertices whose neighbourhood is smaller than the list (a certificate by Hall's theorem
+    that no perfect match exists)
+    """
+    offsets, targets = _build_csr(matrix_size, edges)
+    match_left, match_right = hopcroft_karp(matrix_size, offsets, targets)
+    if all(v != -1 for v in match_left):
+        return list(match_left), None
+    return None, _hall_violator(matrix_size, offsets, targets, match_left, match_right)
+
+
+HOPCROFT_KARP_STEP_COST = 8  # Measured cost of a Hopcroft-Karp step in the steps of the numpy elimination
+
+
+def _is_perfect_match_exists(matrix_size: int, edges: list, trials: int = None,
+                             error_probability: float = None) -> bool:
+    """
+    Check if the given graph contains a perfect match. The randomized algebraic check costs O(n^3) regardless of the
+    number of edges, and the Hopcroft-Karp algorithm costs O(E sqrt(n)); the cheaper one is used. Without numpy the
+    elimination is much slower, so the Hopcroft-Karp algorithm is used. If PARALLEL_WORKERS is not 0, the randomized
+    check is always used, with its trials run in parallel
+    :param trials: the number of trials of the randomized check (PRECISION if None)
+    :param error_probability: if not None, the number of trials is chosen by trials_for_error_probability instead.
+    The Hopcroft-Karp algorithm is exact, so it meets any error probability
+    """
+    if error_probability is not None:
+        trials = trials_for_error_probability(matrix_size, error_probability)
+
+    if PARALLEL_WORKERS > 0 or (
+            numpy is not None and
+            matrix_size ** 3 <= HOPCROFT_KARP_STEP_COST * len(edges) * math.sqrt(matrix_size)):
+        return _randomized_match_exists(matrix_size, edges, trials)
+    match, _ = find_perfect_match(matrix_size, edges)
+    return match is not None
+
+
+def _matrix_inverse_modulo(mat: list, prime: int):
+    """
+    Calculate the inverse of the given matrix over the field of residues modulo 'prime' by the Gauss-Jordan method
+    :return: the inverse matrix, or None if the matrix is singular
+    """
+    matrix_size = len(mat)
+    rows = [list(row) + [int(r_i == c_i) for c_i in range(matrix_size)] for r_i, row in enumerate(mat)]
+    for c in range(matrix_size):
+        pivot_r = next((r_i for r_i in range(c, matrix_size) if rows[r_i][c] != 0), None)
+        if pivot_r is None:
+            return None
+        rows[c], rows[pivot_r] = rows[pivot_r], rows[c]
+
+        pivot_inverse = pow(rows[c][c], -1, prime)
+        pivot_row = rows[c] = [x * pivot_inverse % prime for x in rows[c]]
+        for r_i in range(matrix_size):
+            row = rows[r_i]
+            if r_i == c or row[c] == 0:
+                continue
+            multiplier = row[c]
+            rows[r_i] = [(x - multiplier * y) % prime for x, y in zip(row, pivot_row)]
+    return [row[matrix_size:] for row in rows]
+
+
+def _numpy_matrix_inverse_modulo(mat, prime: int):
+    """
+    Calculate the inverse of the given int64 numpy matrix like _matrix_inverse_modulo (prime < 2^31), eliminating all
+    rows at once
+    """
+    matrix_size = mat.shape[0]
+    rows = numpy.concatenate((mat % prime, numpy.eye(matrix_size, dtype=numpy.int64)), axis=1)
+    for c in range(matrix_size):
+        nonzero = numpy.flatnonzero(rows[c:, c])
+        if len(nonzero) == 0:
+            return None
+        pivot_r = c + nonzero[0]
+        if pivot_r != c:
+            rows[[c, pivot_r]] = rows[[pivot_r, c]]
+
+        rows[c] = rows[c] * pow(int(rows[c, c]), -1, prime) % prime
+        multipliers = rows[:, c].copy()
+        multipliers[c] = 0
+        rows -= numpy.outer(multipliers, rows[c]) % prime
+        rows %= prime
+    return rows[:, matrix_size:].copy()
+
+
+REFACTORIZATION_PERIOD = 256  # Number of rank-one updates of IncrementalMatcher between full inversions
+
+
+class IncrementalMatcher:
+    """
+    A perfect match checker for a bipartite graph changing an edge at a time. It keeps a "randomized" graph matrix
+    (as of _randomized_match_exists) and its inverse modulo FIELD_PRIME. An edge change adds a multiple of a unit
+    matrix to the graph matrix, and the inverse is updated by the Sherman-Morrison formula in O(n^2). The inverse is
+    recalculated every REFACTORIZATION_PERIOD updates; while the graph matrix is singular, it is only recalculated
+    when a query follows changes
+    """
+    def __init__(self, matrix_size: int, edges: list = ()):
+        self.matrix_size = matrix_size
+        self.weights = {}
+        self.updates = 0
+        if numpy is not None:
+            self.mat = numpy.zeros((matrix_size, matrix_size), dtype=numpy.int64)
+        else:
+            self.mat = [[0] * matrix_size for _ in range(matrix_size)]
+        for edge in edges:
+            u, v = self._check_edge(edge[0], edge[1])
+            if (u, v) not in self.weights:
+                self.weights[(u, v)] = random.randrange(1, FIELD_PRIME)
+                self.mat[u][v] = self.weights[(u, v)]
+        self._refactorize()
+
+    def _check_edge(self, u: int, v: int) -> tuple:
+        if not (0 <= u < self.matrix_size and 0 <= v < self.matrix_size):
+            raise Exception("Edge ({}, {}) is out of the graph of size {}".format(u, v, self.matrix_size))
+        return u, v
+
+    def _refactorize(self):
+        self.updates = 0
+        self.dirty = False
+        if numpy is not None:
+            self.inverse = _numpy_matrix_inverse_modulo(self.mat, FIELD_PRIME)
+        else:
+            self.inverse = _matrix_inverse_modulo(self.mat, FIELD_PRIME)
+
+    def _update(self, u: int, v: int, delta: int):
+        """
+        Add 'delta' to the element (u, v) of the graph matrix and update its inverse
+        """
+        self.mat[u][v] = (self.mat[u][v] + delta) % FIELD_PRIME
+        if self.inverse is None:
+            self.dirty = True
+            return
+
+        self.updates += 1
+        # det(A + delta e_u e_v^T) = det(A) (1 + delta A^-1[v][u])
+        denominator = (1 + delta * int(self.inverse[v][u])) % FIELD_PRIME
+        if denominator == 0 or self.updates >= REFACTORIZATION_PERIOD:
+            self._refactorize()
+            return
+
+        factor = delta * pow(denominator, -1, FIELD_PRIME) % FIELD_PRIME
+        if numpy is not None:
+            inverse = self.inverse
+            row = inverse[v] * factor % FIELD_PRIME
+            # Both factors are less than 2^31, so the products fit in int64
+            inverse -= numpy.outer(inverse[:, u], row) % FIELD_PRIME
+            inverse %= FIELD_PRIME
+        else:
+            row = [x * factor % FIELD_PRIME for x in self.inverse[v]]
+            for inverse_row in self.inverse:
+                multiplier = inverse_row[u]
+                if multiplier != 0:
+                    inverse_row[:] = [(x - multiplier * y) % FIELD_PRIME for x, y in zip(inverse_row, row)]
+
+    def add_edge(self, u: int, v: int):
+        u, v = self._check_edge(u, v)
+        if (u, v) in self.weights:
+            return
+        self.weights[(u, v)] = random.randrange(1, FIELD_PRIME)
+        self._update(u, v, self.weights[(u, v)])
+
+    def remove_edge(self, u: int, v: int):
+        u, v = self._check_edge(u, v)
+        weight = self.weights.pop((u, v), None)
+        if weight is not None:
+            self._update(u, v, -weight)
+
+    def is_perfect_match_exists(self) -> bool:
+        """
+        Check if the current graph contains a perfect match. The answer "no" is wrong with probability at most
+        n / (FIELD_PRIME - 1)
+        """
+        if self.inverse is None and self.dirty:
+            self._refactorize()
+        return self.inverse is not None
 
 
 def main():
-    standard_graph, edges = _input_graph()
-    perfect_match_exists = _is_perfect_match_exists(standard_graph, edges)
+    matrix_size, edges = _input_graph()
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'witness':
+        match, violator = find_perfect_match(matrix_size, edges)
+        if match is not None:
+            print('yes')
+            for u, v in enumerate(match):
+                print(u, v)
+        else:
+            print('no')
+            print(' '.join(map(str, violator)))
+        return
+
+    perfect_match_exists = _is_perfect_match_exists(matrix_size, edges)
 
     if perfect_match_exists:
         print('yes')
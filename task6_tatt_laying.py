@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 
 import math
+from array import array
+from collections import OrderedDict, deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def main():
@@ -20,33 +27,128 @@ def main():
         graph[e[0]].append(e[1])
         graph[e[1]].append(e[0])
 
-    cycle_finish = find_border_cycle(graph)
-    graph = planarize_border_and_prepare_graph(graph, cycle_finish)
-    graph = planarize_graph(graph, cycle_finish + 1)
-
+    coordinates, _ = layout_graph(graph)
     for i in range(len(graph)):
-        print(i, graph[i][1][0], graph[i][1][1])
+        print(i, coordinates[i][0], coordinates[i][1])
 
 
-def find_border_cycle(graph: list) -> int:
+def _shortest_cycle_through(neighbours: list, v: int) -> list or None:
+    """
+    Find a shortest cycle through the vertex 'v' by a breadth-first search, where every vertex remembers the neighbour
+    of 'v' its path starts with: the first edge joining two different such branches closes the cycle
+    :return: vertices of the cycle in order, or None if 'v' is on no cycle
+    """
+    parent = {v: -1}
+    branch = {}
+    queue = deque()
+    for w in neighbours[v]:
+        parent[w] = v
+        branch[w] = w
+        queue.append(w)
+    while queue:
+        x = queue.popleft()
+        for y in neighbours[x]:
+            if y == v:
+                continue
+            if y not in parent:
+                parent[y] = x
+                branch[y] = branch[x]
+                queue.append(y)
+            elif branch[y] != branch[x]:
+                path_x = [x]
+                while parent[path_x[-1]] != v:
+                    path_x.append(parent[path_x[-1]])
+                path_y = [y]
+                while parent[path_y[-1]] != v:
+                    path_y.append(parent[path_y[-1]])
+                return [v] + path_x[::-1] + path_y
+    return None
+
+
+def _is_peripheral_cycle(neighbours: list, cycle: list) -> bool:
+    """
+    Check the cycle is induced (has no chords) and non-separating (the other vertices with edges stay connected), and
+    that the other vertices are attached to at least 3 of its vertices. In a 3-connected planar graph such cycles are
+    exactly the face borders. With fewer attachments the other vertices would be pulled onto a segment between two
+    border vertices, so the layout would not be an embedding
+    """
+    on_cycle = set(cycle)
+    for v in cycle:
+        if sum(1 for w in neighbours[v] if w in on_cycle) != 2:
+            return False
+
+    rest = [v for v in range(len(neighbours)) if v not in on_cycle and len(neighbours[v]) > 0]
+    if len(rest) == 0:
+        return True
+    reached = {rest[0]}
+    attachments = set()
+    stack = [rest[0]]
+    while stack:
+        x = stack.pop()
+        for y in neighbours[x]:
+            if y in on_cycle:
+                attachments.add(y)
+            elif y not in reached:
+                reached.add(y)
+                stack.append(y)
+    return len(reached) == len(rest) and len(attachments) >= 3
+
+
+def _first_vertices_cycle(neighbours: list) -> list or None:
     """
-    Find a cycle which is a border of some edge
-    :returns: the index of a vertex which is the last vertex in the cycle
+    Get the border assumed by the original format: the vertices 0, 1, ..., k forming a cycle in this order
+    :return: the cycle, or None if the first vertices do not form one
     """
-    cycle = set()
-    cycle_finish_index = -1
-    previous_v = -1
+    for i in range(1, len(neighbours)):
+        if i - 1 not in neighbours[i]:
+            return None
+        # The first vertex adjacent to an earlier one other than its predecessor closes the cycle
+        earlier = [v for v in neighbours[i] if v < i - 1]
+        if len(earlier) > 0:
+            return list(range(i + 1)) if earlier == [0] else None
+    return None
+
+
+def find_border_cycle(graph: list) -> list:
+    """
+    Find a cycle which is a border of some face (see _is_peripheral_cycle). The vertices 0, 1, ..., k are used if
+    they form such a cycle; otherwise the shortest cycles through vertices are tried in the order of the degrees of
+    the vertices. This finds some face, not necessarily the outer or the largest one. It is not linear: every
+    candidate costs O(E), so the worst case is O(V * E), although on meshes one of the first candidates is accepted
+    :returns: the vertices of the cycle in order
+    """
+    neighbours = [set(adjacent) for adjacent in graph]
+
+    cycle = _first_vertices_cycle(neighbours)
+    if cycle is not None and _is_peripheral_cycle(neighbours, cycle):
+        return cycle
 
-    i = 0
-    while i < len(graph) and cycle_finish_index < 0:
-        cycle.add(i)
-        for v in cycle:
-            if v != previous_v and v in graph[i]:
-                cycle_finish_index = i
-        previous_v = i
-        i += 1
+    # Counting sort of vertices by their degrees
+    by_degree = [[] for _ in range(max(map(len, neighbours), default=0) + 1)]
+    for v in range(len(neighbours)):
+        by_degree[len(neighbours[v])].append(v)
 
-    return cycle_finish_index
+    for degree in range(2, len(by_degree)):
+        for v in by_degree[degree]:
+            cycle = _shortest_cycle_through(neighbours, v)
+            if cycle is not None and _is_peripheral_cycle(neighbours, cycle):
+                return cycle
+
+    raise Exception("The graph has no face border cycle")
+
+
+def relabel_border_first(graph: list, cycle: list) -> (list, list):
+    """
+    Renumber the vertices of the graph (given by adjacency lists), so that the vertices of the 'cycle' go first in
+    their order
+    :return: (the renumbered graph, a list of the original numbers of vertices)
+    """
+    on_cycle = set(cycle)
+    order = list(cycle) + [v for v in range(len(graph)) if v not in on_cycle]
+    numbers = [0] * len(graph)
+    for new_v, v in enumerate(order):
+        numbers[v] = new_v
+    return [[numbers[w] for w in graph[v]] for v in order], order
 
 
 CIRCLE_RADIUS = 1.0
@@ -76,53 +178,211 @@ def planarize_border_and_prepare_graph(graph: list, border_cycle_finish: int) ->
     return graph
 
 
-def _solve_leq(mat: list, b: list) -> list:
+class SparseMatrix:
     """
-    Solve the linear equation using Gaussian elimination method
+    A square matrix in the compressed sparse row form: the non-zero elements of the i-th row are
+    data[indptr[i]:indptr[i + 1]] in the columns indices[indptr[i]:indptr[i + 1]]
     """
-    r = 0
-    c = 0
-    matrix_size = len(mat)
-
-    while r < matrix_size and c < matrix_size:
-        # Find the maximum row
-        r_i_max = None
-        r_i_max_value = 0.0
-        for r_i in range(r, matrix_size):
-            r_i_abs = abs(mat[r_i][c])
-            if r_i_abs > r_i_max_value:
-                r_i_max = r_i
-                r_i_max_value = r_i_abs
-
-        # Swap the maximum and the current rows
-        if r_i_max != r:
-            r_tmp = mat[r_i_max]
-            mat[r_i_max] = mat[r]
-            mat[r] = r_tmp
-            b_tmp = b[r_i_max]
-            b[r_i_max] = b[r]
-            b[r] = b_tmp
-
-        # Divide all rows below
-        for r_i in range(r + 1, matrix_size):
-            multiplier = mat[r_i][c] / mat[r][c]
-            mat[r_i][c] = 0.0
-            for c_i in range(c + 1, matrix_size):
-                mat[r_i][c_i] = mat[r_i][c_i] - (mat[r][c] * multiplier)
-            b[r_i] = b[r_i] - (b[r] * multiplier)
+    def __init__(self, size: int):
+        self.size = size
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.data = array('d')
+        self._numpy_arrays = None
+
+    def append_row(self, row: dict):
+        """
+        Append the next row, given as a dict {column: value}
+        """
+        for column, value in row.items():
+            self.indices.append(column)
+            self.data.append(value)
+        self.indptr.append(len(self.indices))
+
+    def diagonal(self) -> list:
+        result = [0.0] * self.size
+        for i in range(self.size):
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                if self.indices[k] == i:
+                    result[i] += self.data[k]
+        return result
+
+    def multiply(self, x):
+        """
+        Multiply the matrix by a vector (a list, or a numpy array if numpy is available). With numpy, 'x' may also be
+        a 2-D array, whose rows are vectors multiplied at once
+        """
+        if numpy is not None:
+            if self._numpy_arrays is None:
+                indptr = numpy.frombuffer(self.indptr, dtype=numpy.int64)
+                # Empty rows have to be excluded, as reduceat would take the next element for them
+                nonempty = indptr[:-1] < indptr[1:]
+                self._numpy_arrays = (
+                    None if nonempty.all() else nonempty,
+                    indptr[:-1][nonempty],
+                    numpy.frombuffer(self.indices, dtype=numpy.int64),
+                    numpy.frombuffer(self.data, dtype=numpy.float64),
+                )
+            nonempty, starts, indices, data = self._numpy_arrays
+            products = numpy.take(x, indices, axis=-1)
+            products *= data
+            if nonempty is None:
+                return numpy.add.reduceat(products, starts, axis=-1)
+            result = numpy.zeros(x.shape)
+            result[..., nonempty] = numpy.add.reduceat(products, starts, axis=-1)
+            return result
+
+        indptr, indices, data = self.indptr, self.indices, self.data
+        return [
+            sum(data[k] * x[indices[k]] for k in range(indptr[i], indptr[i + 1]))
+            for i in range(self.size)
+        ]
+
+
+CONJUGATE_GRADIENT_TOLERANCE = 1e-12  # Relative residual norm at which the conjugate gradient method stops
+
+
+def _dot(x: list, y: list) -> float:
+    return math.fsum(x_i * y_i for x_i, y_i in zip(x, y))
+
+
+def _solve_leq_column(mat: SparseMatrix, inverse_diagonal: list, b: list, x: list) -> list:
+    """
+    Solve the linear equation with a symmetric positive definite sparse matrix by the conjugate gradient method with
+    the Jacobi (diagonal) preconditioner, starting with the approximation 'x'. Every iteration costs O(non-zero
+    elements)
+    """
+    residual = [b_i - p_i for b_i, p_i in zip(b, mat.multiply(x))]
+    z = [d_i * r_i for d_i, r_i in zip(inverse_diagonal, residual)]
+    direction = z
+    rz = _dot(residual, z)
+    threshold = CONJUGATE_GRADIENT_TOLERANCE ** 2 * _dot(b, b)
+
+    # In exact arithmetic the method converges in 'size' iterations; rounding errors may require a few more
+    for _ in range(2 * mat.size + 10):
+        if _dot(residual, residual) <= threshold:
+            break
+        product = mat.multiply(direction)
+        step = rz / _dot(direction, product)
+        x = [x_i + step * d_i for x_i, d_i in zip(x, direction)]
+        residual = [r_i - step * p_i for r_i, p_i in zip(residual, product)]
+        z = [d_i * r_i for d_i, r_i in zip(inverse_diagonal, residual)]
+        rz_next = _dot(residual, z)
+        direction = [z_i + (rz_next / rz) * d_i for z_i, d_i in zip(z, direction)]
+        rz = rz_next
+
+    return x
+
+
+def _numpy_solve_leq(mat: SparseMatrix, inverse_diagonal, b, x):
+    """
+    Solve the linear equation like _solve_leq_column for all rows of the 2-D numpy arrays 'b' and 'x' at once: the
+    right-hand sides share the matrix multiplications, and each of them has its own step sizes
+    """
+    residual = b - mat.multiply(x)
+    z = inverse_diagonal * residual
+    direction = z
+    rz = numpy.einsum('ij,ij->i', residual, z)
+    threshold = CONJUGATE_GRADIENT_TOLERANCE ** 2 * numpy.einsum('ij,ij->i', b, b)
+
+    for _ in range(2 * mat.size + 10):
+        active = numpy.einsum('ij,ij->i', residual, residual) > threshold
+        if not active.any():
+            break
+        product = mat.multiply(direction)
+        # Converged right-hand sides are kept as they are
+        denominator = numpy.einsum('ij,ij->i', direction, product)
+        step = numpy.where(active, rz / numpy.where(active, denominator, 1.0), 0.0)[:, None]
+        x += step * direction
+        residual -= step * product
+        z = inverse_diagonal * residual
+        rz_next = numpy.einsum('ij,ij->i', residual, z)
+        direction = z + numpy.where(active, rz_next / numpy.where(active, rz, 1.0), 0.0)[:, None] * direction
+        rz = rz_next
+
+    return x
+
+
+def _solve_leq(mat: SparseMatrix, inverse_diagonal: list, columns: list, initial: list) -> list:
+    """
+    Solve the linear equations with a symmetric positive definite sparse matrix and several right-hand sides
+    :param inverse_diagonal: inverses of the diagonal elements of the matrix
+    :param columns: a list of right-hand sides
+    :param initial: a list of initial approximations of the solutions
+    :return: a list of solutions
+    """
+    if numpy is not None:
+        solutions = _numpy_solve_leq(
+            mat, numpy.array(inverse_diagonal), numpy.array(columns, dtype=numpy.float64),
+            numpy.array(initial, dtype=numpy.float64)
+        )
+        return [list(map(float, solution)) for solution in solutions]
 
-        r += 1
-        c += 1
+    return [_solve_leq_column(mat, inverse_diagonal, b, x) for b, x in zip(columns, initial)]
 
-    # Now we have a triangulated matrix. Reverse-solve the linear system
-    solution = []
-    for i in range(matrix_size - 1, -1, -1):
-        solution_i = b[i] / mat[i][i]
-        solution.append(solution_i)
-        for j in range(i):
-            b[j] -= mat[j][i] * solution_i
 
-    return solution
+class TutteSystem:
+    """
+    The linear system of the coordinates of the vertices being examined, for a given graph topology: every vertex is
+    the barycenter of its neighbours. The matrix (the Laplacian of the vertices being examined) is symmetric and
+    positive definite, as all of them are connected to the border. A vertex without neighbours has no barycenter; its
+    equation is just "the coordinate is 0", which keeps the matrix positive definite. The system is assembled once and
+    then solved for any border coordinates; the last solution is the initial approximation for the next one
+    """
+    def __init__(self, graph: list, planarization_start_i: int):
+        self.planarization_start_i = planarization_start_i
+        matrix_size = len(graph) - planarization_start_i
+
+        self.matrix = SparseMatrix(matrix_size)
+        # The border neighbours of each vertex being examined
+        self.border_links = []
+        for i in range(planarization_start_i, len(graph)):
+            adjacent = graph[i][0]
+            row = {i - planarization_start_i: float(max(1, len(adjacent)))}
+            links = []
+            for adj in adjacent:
+                if adj >= planarization_start_i:
+                    row[adj - planarization_start_i] = row.get(adj - planarization_start_i, 0.0) - 1.0
+                else:
+                    links.append(adj)
+            self.matrix.append_row(row)
+            self.border_links.append(links)
+
+        self.inverse_diagonal = [1.0 / d for d in self.matrix.diagonal()]
+        self.solutions = [[0.0] * matrix_size, [0.0] * matrix_size]
+
+    def solve(self, graph: list) -> list:
+        """
+        Calculate the coordinates of the vertices being examined, given the coordinates of the border in 'graph'
+        :return: [X coordinates, Y coordinates]
+        """
+        columns = [
+            [math.fsum(graph[adj][1][coordinate] for adj in links) for links in self.border_links]
+            for coordinate in range(2)
+        ]
+        self.solutions = _solve_leq(self.matrix, self.inverse_diagonal, columns, self.solutions)
+        return self.solutions
+
+
+SYSTEM_CACHE_SIZE = 8  # Number of graph topologies whose TutteSystem objects are kept
+
+_system_cache = OrderedDict()
+
+
+def _get_system(graph: list, planarization_start_i: int) -> TutteSystem:
+    """
+    Get the TutteSystem for the topology of the 'graph', reusing a cached one (the least recently used are evicted)
+    """
+    key = (planarization_start_i, tuple(tuple(vertex[0]) for vertex in graph))
+    system = _system_cache.get(key)
+    if system is None:
+        system = TutteSystem(graph, planarization_start_i)
+        _system_cache[key] = system
+        if len(_system_cache) > SYSTEM_CACHE_SIZE:
+            _system_cache.popitem(last=False)
+    else:
+        _system_cache.move_to_end(key)
+    return system
 
 
 def planarize_graph(graph: list, planarization_start_i: int) -> list:
@@ -130,37 +390,11 @@ def planarize_graph(graph: list, planarization_start_i: int) -> list:
     Planarize the graph whose border is already planarized. The border consists of the first N vertices, where N is
     equal to 'planarization_start_i'
     """
-    matrix_size = len(graph) - planarization_start_i
+    if planarization_start_i >= len(graph):
+        return graph
 
-    # Calculate X coordinates for the points being examined
-    matrix = [[0.0 for _ in range(matrix_size)] for _ in range(matrix_size)]
-    b_vector = [0.0 for _ in range(matrix_size)]
-    for i in range(planarization_start_i, len(graph)):
-        adjacent = graph[i][0]
-        for adj in adjacent:
-            if adj >= planarization_start_i:
-                matrix[i - planarization_start_i][adj - planarization_start_i] = 1.0
-            else:
-                b_vector[i - planarization_start_i] -= graph[adj][1][0]
-        matrix[i - planarization_start_i][i - planarization_start_i] = -float(len(adjacent))
-
-    # Now we must solve a system of linear equations: (matrix) * x = b
-    solutions_x = _solve_leq(matrix, b_vector)
-
-    # Calculate X coordinates for the points being examined
-    matrix = [[0.0 for _ in range(matrix_size)] for _ in range(matrix_size)]
-    b_vector = [0.0 for _ in range(matrix_size)]
-    for i in range(planarization_start_i, len(graph)):
-        adjacent = graph[i][0]
-        for adj in adjacent:
-            if adj >= planarization_start_i:
-                matrix[i - planarization_start_i][adj - planarization_start_i] = 1.0
-            else:
-                b_vector[i - planarization_start_i] -= graph[adj][1][1]
-        matrix[i - planarization_start_i][i - planarization_start_i] = -float(len(adjacent))
-
-    # Now we must solve a system of linear equations: (matrix) * y = b
-    solutions_y = _solve_leq(matrix, b_vector)
+    # Calculate X and Y coordinates for the points being examined together
+    solutions_x, solutions_y = _get_system(graph, planarization_start_i).solve(graph)
 
     # Now set the coordinates for each vertex
     for i in range(planarization_start_i, len(graph)):
@@ -169,5 +403,151 @@ def planarize_graph(graph: list, planarization_start_i: int) -> list:
     return graph
 
 
+def layout_graph(graph: list, cycle: list or None = None) -> (list, list):
+    """
+    Lay out the graph given by adjacency lists: put a face border on a circle and every other vertex at the
+    barycenter of its neighbours (vertices without neighbours are put at the center)
+    :param cycle: the border cycle; if None, it is found by find_border_cycle
+    :return: (a list of coordinates [x, y] of the vertices, the border cycle)
+    """
+    if cycle is None:
+        cycle = find_border_cycle(graph)
+    relabeled, order = relabel_border_first(graph, cycle)
+    cycle_finish = len(cycle) - 1
+    relabeled = planarize_border_and_prepare_graph(relabeled, cycle_finish)
+    relabeled = planarize_graph(relabeled, cycle_finish + 1)
+
+    coordinates = [None] * len(graph)
+    for i in range(len(graph)):
+        coordinates[order[i]] = relabeled[i][1]
+    return coordinates, cycle
+
+
+RELAYOUT_TOLERANCE = 1e-3  # Maximum distance of a vertex from the barycenter of neighbours, relative to its edges
+RELAXATION_FACTOR = 1.5  # Over-relaxation factor of the incremental re-layout
+RELAYOUT_MAX_UPDATES = 10  # Relaxations per vertex of the graph after which a re-layout is done from scratch
+
+
+class IncrementalLayout:
+    """
+    A layout of a graph changing a few vertices and edges at a time. The border cycle keeps its place; after changes,
+    the vertices around them are relaxed by successive over-relaxation (Gauss-Seidel steps towards the barycenter of
+    the neighbours, scaled by RELAXATION_FACTOR). Only a vertex whose distance from the barycenter of its neighbours
+    (the barycentric residual) exceeds RELAYOUT_TOLERANCE times the mean length of its edges is moved, and a moved
+    vertex queues its neighbours, so the cost depends on the region affected by the change, not on the size of the
+    graph. The tolerance follows the local geometry, so dense meshes with short edges are relaxed as well as coarse
+    ones. This bounds the residual, not the distance to the exact layout, which may be larger by a factor depending
+    on the graph.
+    Vertices without neighbours keep their coordinates. Changes of the border cycle make the next re-layout a full one,
+    and so does a change which would take more relaxations than RELAYOUT_MAX_UPDATES per vertex
+    """
+    def __init__(self, graph: list):
+        self.neighbours = [set(adjacent) for adjacent in graph]
+        self.coordinates = []
+        self.cycle = []
+        self.border = set()
+        self.pending = set()
+        self.full_relayout = True
+        self.relayout()
+
+    def _full_layout(self, cycle: list or None = None):
+        graph = [list(adjacent) for adjacent in self.neighbours]
+        coordinates, self.cycle = layout_graph(graph, cycle)
+        for v in range(min(len(self.coordinates), len(graph))):
+            if len(graph[v]) == 0:
+                coordinates[v] = self.coordinates[v]
+        self.coordinates = coordinates
+        self.border = set(self.cycle)
+        self.pending = set()
+        self.full_relayout = False
+
+    def _edge_changed(self, u: int, v: int):
+        if u in self.border and v in self.border:
+            # The border cycle is only kept while no edge between its vertices changes
+            self.full_relayout = True
+            return
+        for w in (u, v):
+            if w not in self.border:
+                self.pending.add(w)
+
+    def add_vertex(self, adjacent: list) -> int:
+        """
+        Add a vertex connected to the given ones
+        :return: the number of the new vertex
+        """
+        v = len(self.neighbours)
+        self.neighbours.append(set())
+        # The new vertex starts at the barycenter of its neighbours
+        self.coordinates.append([
+            math.fsum(self.coordinates[w][coordinate] for w in adjacent) / max(1, len(adjacent))
+            for coordinate in range(2)
+        ])
+        for w in adjacent:
+            self.add_edge(v, w)
+        return v
+
+    def add_edge(self, u: int, v: int):
+        self.neighbours[u].add(v)
+        self.neighbours[v].add(u)
+        self._edge_changed(u, v)
+
+    def remove_edge(self, u: int, v: int):
+        self.neighbours[u].discard(v)
+        self.neighbours[v].discard(u)
+        self._edge_changed(u, v)
+
+    def relayout(self) -> list:
+        """
+        Update the layout after the changes made since the previous one
+        :return: a list of coordinates [x, y] of the vertices
+        """
+        if self.full_relayout:
+            self._full_layout()
+            return self.coordinates
+
+        queue = deque(self.pending)
+        queued = set(self.pending)
+        self.pending = set()
+        updates_left = RELAYOUT_MAX_UPDATES * len(self.neighbours)
+        while queue:
+            if updates_left == 0:
+                # The change is too wide for the relaxation to pay off
+                self._full_layout(self.cycle)
+                break
+            v = queue.popleft()
+            queued.discard(v)
+            updates_left -= 1
+
+            adjacent = self.neighbours[v]
+            if len(adjacent) == 0:
+                continue
+            position = self.coordinates[v]
+            residuals = [
+                sum(self.coordinates[w][coordinate] for w in adjacent) / len(adjacent) - position[coordinate]
+                for coordinate in range(2)
+            ]
+            residual = math.hypot(*residuals)
+            tolerance = RELAYOUT_TOLERANCE * sum(
+                math.hypot(self.coordinates[w][0] - position[0], self.coordinates[w][1] - position[1])
+                for w in adjacent
+            ) / len(adjacent)
+            if residual <= tolerance:
+                continue
+            for coordinate in range(2):
+                position[coordinate] += RELAXATION_FACTOR * residuals[coordinate]
+
+            # The moved vertex changes the barycenters of its neighbours; over-relaxation also leaves the vertex
+            # itself off its barycenter by (RELAXATION_FACTOR - 1) of the residual
+            for w in adjacent:
+                if w not in self.border and w not in queued:
+                    queued.add(w)
+                    queue.append(w)
+            if abs(RELAXATION_FACTOR - 1.0) * residual > tolerance and v not in queued:
+                queued.add(v)
+                queue.append(v)
+
+        return self.coordinates
+
+
 if __name__ == '__main__':
     main()
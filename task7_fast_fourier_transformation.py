@@ -1,41 +1,840 @@
 #!/usr/bin/env python3
 
 import math
+import sys
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def main():
-    coeffs = list(map(float, input().split()))
-    coeffs = [complex(coeff, 0.0) for coeff in coeffs]
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'complex'
+    if mode not in MODES:
+        raise Exception("Unknown mode '{}'. Available modes: {}".format(mode, ', '.join(MODES)))
 
-    result = fast_fourier_transform(coeffs)
+    MODES[mode]()
 
+
+def _print_spectrum(result: list):
     print(' '.join([f'{r.real},{r.imag}' for r in result]))
 
 
+def _complex_mode():
+    coeffs = list(map(float, input().split()))
+    _print_spectrum(fast_fourier_transform([complex(coeff, 0.0) for coeff in coeffs]))
+
+
+def _real_mode():
+    coeffs = list(map(float, input().split()))
+    _print_spectrum(real_fast_fourier_transform(coeffs))
+
+
+def _filter_mode():
+    kernel = list(map(float, input().split()))
+
+    stream = open(sys.argv[2]) if len(sys.argv) > 2 else sys.stdin
+    try:
+        for block in overlap_add_convolve(read_sample_blocks(stream), kernel):
+            if len(block) > 0:
+                sys.stdout.write(' '.join(map(str, block)))
+                sys.stdout.write('\n')
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+MODES = {
+    'complex': _complex_mode,  # Print the full spectrum, calculated by a complex transformation
+    'real': _real_mode,  # Print the non-redundant half of the spectrum, calculated by a real transformation
+    # Convolve the samples (the rest of stdin or a file given as the next argument) with the kernel (the first line)
+    # and print the result block by block
+    'filter': _filter_mode,
+}
+
+
+PLAN_CACHE_SIZE = 16  # Maximum number of transformation plans (one per transformation size) kept in memory
+
+_plan_cache = OrderedDict()
+
+MIXED_RADIXES = (2, 3, 5)  # Prime factors of transformation sizes handled by the mixed-radix algorithm
+
+
+class _FFTPlan:
+    """
+    A precomputed plan of a radix-2 transformation of the given size:
+    * 'swaps' - pairs of indexes to exchange in order to apply the bit-reversal permutation
+    * 'stages' - a list of (half_size, twiddles) for every butterfly stage
+    """
+    def __init__(self, n: int):
+        self.n = n
+        self.swaps = _bit_reversal_swaps(n)
+        self.stages = []
+
+        half_size = 1
+        while half_size < n:
+            angle = math.pi / half_size
+            twiddles = [complex(math.cos(angle * k), math.sin(angle * k)) for k in range(half_size)]
+            self.stages.append((half_size, twiddles))
+            half_size *= 2
+
+
+class _MixedRadixPlan:
+    """
+    A precomputed plan of a mixed-radix transformation of a size which has no prime factors other than MIXED_RADIXES:
+    * 'permutation' - the digit-reversal permutation of the input
+    * 'stages' - a list of (radix, sub_size, twiddles, roots) for every butterfly stage, where 'twiddles[j]' are the
+    twiddle factors of the j-th sub-transformation and 'roots' are the powers of the radix-th root of unity
+    """
+    def __init__(self, n: int, radixes: list):
+        self.n = n
+        self.permutation = _digit_reversal_permutation(list(range(n)), radixes)
+        self.stages = []
+
+        sub_size = 1
+        for radix in radixes:
+            size = sub_size * radix
+            angle = (2.0 * math.pi) / size
+            twiddles = [
+                [complex(math.cos(angle * j * k), math.sin(angle * j * k)) for k in range(sub_size)]
+                for j in range(radix)
+            ]
+            roots = [complex(math.cos(angle * sub_size * q), math.sin(angle * sub_size * q)) for q in range(radix)]
+            self.stages.append((radix, sub_size, twiddles, roots))
+            sub_size = size
+
+
+class _BluesteinPlan:
+    """
+    A precomputed plan of a Bluestein (chirp-z) transformation of an arbitrary size. The transformation is reduced to
+    a convolution of a power-of-two size 'convolution_size':
+    * 'chirp' - the chirp sequence exp(i * pi * k^2 / n)
+    * 'kernel_values' - the transformed conjugate chirp, which is the second operand of the convolution
+    """
+    def __init__(self, n: int):
+        self.n = n
+        self.convolution_size = _next_power_of_two(2 * n - 1)
+
+        self.chirp = []
+        for k in range(n):
+            # Reduce k^2 modulo 2n to keep the angle small and precise
+            angle = (math.pi * ((k * k) % (2 * n))) / n
+            self.chirp.append(complex(math.cos(angle), math.sin(angle)))
+
+        kernel = [0j] * self.convolution_size
+        for k in range(n):
+            kernel[k] = self.chirp[k].conjugate()
+        for k in range(1, n):
+            kernel[self.convolution_size - k] = self.chirp[k].conjugate()
+        self.kernel_values = _radix2_inplace(kernel, _get_plan(self.convolution_size))
+
+
+def _bit_reversal_swaps(n: int) -> list:
+    """
+    Calculate the bit-reversal permutation of size 'n' (a power of two)
+    :return: a list of pairs (i, j), i < j, of indexes to swap
+    """
+    swaps = []
+    j = 0
+    for i in range(1, n):
+        bit = n >> 1
+        while j & bit:
+            j ^= bit
+            bit >>= 1
+        j ^= bit
+        if i < j:
+            swaps.append((i, j))
+    return swaps
+
+
+def _digit_reversal_permutation(indexes: list, radixes: list) -> list:
+    """
+    Reorder 'indexes' so that every sub-transformation of the mixed-radix algorithm gets its decimated input
+    in a contiguous block
+    """
+    if len(radixes) == 0:
+        return indexes
+
+    radix = radixes[-1]
+    result = []
+    for j in range(radix):
+        result.extend(_digit_reversal_permutation(indexes[j::radix], radixes[:-1]))
+    return result
+
+
+def _factorize_mixed(n: int) -> list or None:
+    """
+    Factorize 'n' into MIXED_RADIXES
+    :return: a list of factors or None if 'n' has other prime factors
+    """
+    radixes = []
+    for radix in MIXED_RADIXES:
+        while n % radix == 0:
+            radixes.append(radix)
+            n //= radix
+    if n != 1:
+        return None
+    return radixes
+
+
+def _next_power_of_two(n: int) -> int:
+    return 1 << max(n - 1, 0).bit_length()
+
+
+def _next_fast_size(n: int) -> int:
+    """
+    Find the smallest size not less than 'n' which has no prime factors other than MIXED_RADIXES
+    """
+    result = _next_power_of_two(n)
+    power_5 = 1
+    while power_5 < result:
+        power_35 = power_5
+        while power_35 < result:
+            size = power_35
+            while size < n:
+                size *= 2
+            if size < result:
+                result = size
+            power_35 *= 3
+        power_5 *= 5
+    return result
+
+
+def _get_cached(key, create):
+    """
+    Get a plan identified by 'key' from the cache, calling 'create()' when it is absent. The least recently used plan
+    is evicted when the cache holds more than PLAN_CACHE_SIZE plans
+    """
+    plan = _plan_cache.get(key)
+    if plan is not None:
+        _plan_cache.move_to_end(key)
+        return plan
+
+    plan = create()
+    _plan_cache[key] = plan
+    if len(_plan_cache) > PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+    return plan
+
+
+def _create_plan(n: int):
+    if n & (n - 1) == 0:
+        return _FFTPlan(n)
+    radixes = _factorize_mixed(n)
+    if radixes is not None:
+        return _MixedRadixPlan(n, radixes)
+    return _BluesteinPlan(n)
+
+
+def _get_plan(n: int):
+    """
+    Get a plan for the complex transformation of size 'n'
+    """
+    return _get_cached(n, lambda: _create_plan(n))
+
+
+def _get_real_twiddles(n: int) -> list:
+    """
+    Get the twiddle factors exp(2 * pi * i * k / n), k = 0..n/2, used to split a packed real transformation of
+    (even) size 'n'
+    """
+    def create():
+        angle = (2.0 * math.pi) / n
+        return [complex(math.cos(angle * k), math.sin(angle * k)) for k in range(n // 2 + 1)]
+
+    return _get_cached(('real', n), create)
+
+
+def _radix2_inplace(buffer: list, plan: _FFTPlan) -> list:
+    """
+    Conduct a radix-2 transformation of the 'buffer' (of a power-of-two size) in place
+    """
+    n = len(buffer)
+
+    for i, j in plan.swaps:
+        buffer[i], buffer[j] = buffer[j], buffer[i]
+
+    # The first stage has a single twiddle factor equal to 1
+    for i in range(0, n, 2):
+        u = buffer[i]
+        v = buffer[i + 1]
+        buffer[i] = u + v
+        buffer[i + 1] = u - v
+
+    for half_size, twiddles in plan.stages[1:]:
+        size = half_size * 2
+        for start in range(0, n, size):
+            middle = start + half_size
+            end = start + size
+            evens = buffer[start:middle]
+            odds = [w * o for w, o in zip(twiddles, buffer[middle:end])]
+            buffer[start:middle] = [e + o for e, o in zip(evens, odds)]
+            buffer[middle:end] = [e - o for e, o in zip(evens, odds)]
+
+    return buffer
+
+
+def _mixed_radix_inplace(buffer: list, plan: _MixedRadixPlan) -> list:
+    """
+    Conduct a mixed-radix transformation of the 'buffer' in place
+    """
+    n = len(buffer)
+
+    buffer[:] = [buffer[p] for p in plan.permutation]
+
+    for radix, sub_size, twiddles, roots in plan.stages:
+        size = sub_size * radix
+        for start in range(0, n, size):
+            parts = [
+                [w * v for w, v in zip(twiddles[j], buffer[start + j * sub_size:start + (j + 1) * sub_size])]
+                for j in range(radix)
+            ]
+            if radix == 2:
+                p0, p1 = parts
+                buffer[start:start + sub_size] = [a + b for a, b in zip(p0, p1)]
+                buffer[start + sub_size:start + size] = [a - b for a, b in zip(p0, p1)]
+            elif radix == 3:
+                p0, p1, p2 = parts
+                for q in range(3):
+                    r1 = roots[q]
+                    r2 = roots[(2 * q) % 3]
+                    buffer[start + q * sub_size:start + (q + 1) * sub_size] = [
+                        a + r1 * b + r2 * c for a, b, c in zip(p0, p1, p2)
+                    ]
+            else:
+                p0, p1, p2, p3, p4 = parts
+                for q in range(5):
+                    r1 = roots[q]
+                    r2 = roots[(2 * q) % 5]
+                    r3 = roots[(3 * q) % 5]
+                    r4 = roots[(4 * q) % 5]
+                    buffer[start + q * sub_size:start + (q + 1) * sub_size] = [
+                        a + r1 * b + r2 * c + r3 * d + r4 * e for a, b, c, d, e in zip(p0, p1, p2, p3, p4)
+                    ]
+
+    return buffer
+
+
+def _bluestein_inplace(buffer: list, plan: _BluesteinPlan) -> list:
+    """
+    Conduct a Bluestein transformation of the 'buffer' of an arbitrary size in place
+    """
+    n = len(buffer)
+    convolution_size = plan.convolution_size
+    convolution_plan = _get_plan(convolution_size)
+
+    values = [v * c for v, c in zip(buffer, plan.chirp)]
+    values.extend([0j] * (convolution_size - n))
+    _radix2_inplace(values, convolution_plan)
+
+    # Inverse transformation of the product, implemented with the forward one by conjugation
+    values = [(v * k).conjugate() for v, k in zip(values, plan.kernel_values)]
+    _radix2_inplace(values, convolution_plan)
+
+    buffer[:] = [v.conjugate() * c / convolution_size for v, c in zip(values[:n], plan.chirp)]
+    return buffer
+
+
+def fast_fourier_transform_inplace(buffer: list) -> list:
+    """
+    Conduct a fast Fourier transformation of the 'buffer' in place. Power-of-two sizes are transformed by an iterative
+    radix-2 algorithm, sizes with prime factors 2, 3 and 5 - by a mixed-radix algorithm, and all other sizes - by the
+    Bluestein algorithm; all of them take O(n log n) time
+    :return: the 'buffer' itself
+    """
+    n = len(buffer)
+    if n <= 1:
+        return buffer
+
+    plan = _get_plan(n)
+
+    if isinstance(plan, _FFTPlan):
+        return _radix2_inplace(buffer, plan)
+    if isinstance(plan, _MixedRadixPlan):
+        return _mixed_radix_inplace(buffer, plan)
+    return _bluestein_inplace(buffer, plan)
+
+
 def fast_fourier_transform(coeffs: list) -> list:
     """
     Conduct a fast Fourier transformation on the given 'coeffs' polynomial
     :return: result of the fourier transformation
     """
-    result = [complex(0.0, 0.0) for _ in range(len(coeffs))]
+    return fast_fourier_transform_inplace([complex(c) for c in coeffs])
+
+
+def inverse_fast_fourier_transform(values: list) -> list:
+    """
+    Conduct an inverse fast Fourier transformation on the given 'values', so that
+    inverse_fast_fourier_transform(fast_fourier_transform(coeffs)) == coeffs
+    :return: coefficients of the polynomial
+    """
+    n = len(values)
+    buffer = fast_fourier_transform_inplace([complex(v).conjugate() for v in values])
+    return [complex(v.real / n, -v.imag / n) for v in buffer]
+
+
+ifft = inverse_fast_fourier_transform
+
+
+def real_fast_fourier_transform(coeffs: list) -> list:
+    """
+    Conduct a fast Fourier transformation on the given real 'coeffs' polynomial. For an even length n the coefficients
+    are packed into a complex sequence of length n/2, so the transformation costs half of a complex one
+    :return: the non-redundant half of the result, n // 2 + 1 values; the rest is complex-conjugate to it
+    """
+    n = len(coeffs)
+    if n == 0 or n % 2 != 0:
+        return fast_fourier_transform(coeffs)[:n // 2 + 1]
+
+    half = n // 2
+    packed = fast_fourier_transform_inplace([complex(coeffs[2 * k], coeffs[2 * k + 1]) for k in range(half)])
+    packed.append(packed[0])
+    twiddles = _get_real_twiddles(n)
+
+    result = []
+    for k in range(half + 1):
+        z_k = packed[k]
+        z_mirror = packed[half - k].conjugate()
+        evens = z_k + z_mirror
+        odds = (z_k - z_mirror) * twiddles[k]
+        # (evens - i * odds) / 2
+        result.append(complex(evens.real + odds.imag, evens.imag - odds.real) * 0.5)
+    return result
+
+
+def inverse_real_fast_fourier_transform(values: list, n: int = None) -> list:
+    """
+    Conduct an inverse of real_fast_fourier_transform
+    :param values: the non-redundant half of the result of a transformation
+    :param n: the length of the real polynomial; 2 * (len(values) - 1) by default
+    :return: real coefficients of the polynomial
+    """
+    if n is None:
+        n = 2 * (len(values) - 1)
+    if n % 2 != 0:
+        full = [complex(v) for v in values[:n // 2 + 1]]
+        full.extend([full[n - k].conjugate() for k in range(n // 2 + 1, n)])
+        return [v.real for v in inverse_fast_fourier_transform(full)]
+
+    half = n // 2
+    twiddles = _get_real_twiddles(n)
+
+    packed = []
+    for k in range(half):
+        x_k = complex(values[k])
+        x_mirror = complex(values[half - k]).conjugate()
+        evens = x_k + x_mirror
+        odds = (x_k - x_mirror) * twiddles[k].conjugate()
+        # (evens + i * odds) / 2
+        packed.append(complex(evens.real - odds.imag, evens.imag + odds.real) * 0.5)
+
+    packed = inverse_fast_fourier_transform(packed)
+
+    result = []
+    for z in packed:
+        result.append(z.real)
+        result.append(z.imag)
+    return result
+
+
+rfft = real_fast_fourier_transform
+irfft = inverse_real_fast_fourier_transform
+
+
+def _get_numpy_stages(plan) -> tuple:
+    """
+    Convert a radix-2 or a mixed-radix 'plan' into NumPy arrays, stored in the plan itself:
+    :return: (permutation, stages), where 'stages' is a list of (radix, sub_size, twiddles, roots), 'twiddles' is an
+    array of shape (radix, sub_size) and 'roots' is the radix x radix matrix of a small DFT
+    """
+    numpy_stages = getattr(plan, 'numpy_stages', None)
+    if numpy_stages is not None:
+        return numpy_stages
+
+    stages = []
+    if isinstance(plan, _FFTPlan):
+        permutation = list(range(plan.n))
+        for i, j in plan.swaps:
+            permutation[i], permutation[j] = permutation[j], permutation[i]
+        for half_size, twiddles in plan.stages:
+            stages.append((2, half_size, numpy.array([[1.0] * half_size, twiddles], dtype=complex), None))
+    else:
+        permutation = plan.permutation
+        for radix, sub_size, twiddles, roots in plan.stages:
+            roots_matrix = numpy.array([[roots[(q * j) % radix] for j in range(radix)] for q in range(radix)])
+            stages.append((radix, sub_size, numpy.array(twiddles, dtype=complex), roots_matrix))
+
+    plan.numpy_stages = (numpy.array(permutation, dtype=numpy.intp), stages)
+    return plan.numpy_stages
+
+
+def _numpy_transform(values, n: int):
+    """
+    Conduct fast Fourier transformations of every row of the 'values' array of shape (batch, n). Every butterfly stage
+    is a single array operation over the whole batch
+    :return: a new array of the same shape
+    """
+    if n <= 1:
+        return values.copy()
+
+    plan = _get_plan(n)
+
+    if isinstance(plan, _BluesteinPlan):
+        convolution_size = plan.convolution_size
+        chirp = numpy.array(plan.chirp)
+        padded = numpy.zeros((values.shape[0], convolution_size), dtype=complex)
+        padded[:, :n] = values * chirp
+        padded = _numpy_transform(padded, convolution_size) * numpy.array(plan.kernel_values)
+        # Inverse transformation of the product, implemented with the forward one by conjugation
+        padded = _numpy_transform(padded.conj(), convolution_size).conj() / convolution_size
+        return padded[:, :n] * chirp
+
+    batch = values.shape[0]
+    permutation, stages = _get_numpy_stages(plan)
+
+    values = values[:, permutation]
+    for radix, sub_size, twiddles, roots in stages:
+        blocks = values.reshape(batch, n // (radix * sub_size), radix, sub_size) * twiddles
+        if radix == 2:
+            evens = blocks[:, :, 0:1, :]
+            odds = blocks[:, :, 1:2, :]
+            values = numpy.concatenate((evens + odds, evens - odds), axis=2)
+        else:
+            values = numpy.einsum('qj,bsjk->bsqk', roots, blocks)
+        values = values.reshape(batch, n)
+
+    return values
+
+
+def fast_fourier_transform_batch(signals):
+    """
+    Conduct fast Fourier transformations of many signals of the same length at once.
+    When NumPy is available, the transformations are vectorized over the whole batch; otherwise every signal is
+    transformed by fast_fourier_transform
+    :param signals: a 2-dimensional array (or a list of lists) of shape (batch, n)
+    :return: an array of shape (batch, n) when NumPy is available, a list of lists otherwise
+    """
+    if numpy is None:
+        lengths = set(len(signal) for signal in signals)
+        if len(lengths) > 1:
+            raise Exception("All signals in a batch must have the same length. Provided lengths: {}".format(lengths))
+        return [fast_fourier_transform(signal) for signal in signals]
+
+    values = numpy.asarray(signals, dtype=complex)
+    if values.ndim != 2:
+        raise Exception("A batch of signals must be 2-dimensional. Provided shape: {}".format(values.shape))
+
+    return _numpy_transform(values, values.shape[1])
+
+
+CONVOLUTION_NAIVE_THRESHOLD = 32  # Inputs with a shorter operand are convolved directly, without transformations
+
+
+def _convolve_naive(a: list, b: list) -> list:
+    result = [0] * (len(a) + len(b) - 1)
+    for i, a_i in enumerate(a):
+        for j, b_j in enumerate(b):
+            result[i + j] += a_i * b_j
+    return result
+
+
+def convolve(a: list, b: list) -> list:
+    """
+    Calculate a linear convolution of sequences 'a' and 'b' using fast Fourier transformations.
+    The operands are zero-padded to the nearest suitable size automatically. When both operands consist of integers,
+    the result is rounded to integers; if the result may be too large to be rounded exactly, it is calculated by
+    convolve_exact instead
+    :return: a list of len(a) + len(b) - 1 elements
+    """
+    if len(a) == 0 or len(b) == 0:
+        return []
 
-    if len(coeffs) == 1:
-        result[0] = coeffs[0]
-        return result
+    if min(len(a), len(b)) <= CONVOLUTION_NAIVE_THRESHOLD:
+        return _convolve_naive(a, b)
 
-    coeffs_0 = fast_fourier_transform([coeffs[i * 2] for i in range(len(coeffs) // 2)])
-    coeffs_1 = fast_fourier_transform([coeffs[i * 2 + 1] for i in range(len(coeffs) // 2)])
+    result_size = len(a) + len(b) - 1
 
-    w = complex(1.0, 0.0)
-    wn = complex(math.cos((2.0 * math.pi) / len(coeffs)), math.sin((2.0 * math.pi) / len(coeffs)))
+    integral = all(isinstance(v, int) for v in a) and all(isinstance(v, int) for v in b)
+    if integral and _convolution_bound(a, b) >= FLOAT_CONVOLUTION_EXACT_BOUND:
+        return convolve_exact(a, b)
 
-    for i in range(len(coeffs) // 2):
-        result[i] = coeffs_0[i] + w * coeffs_1[i]
-        result[i + (len(coeffs) // 2)] = coeffs_0[i] - w * coeffs_1[i]
-        w *= wn
+    if any(isinstance(v, complex) for v in a) or any(isinstance(v, complex) for v in b):
+        size = _next_fast_size(result_size)
+        a_values = fast_fourier_transform_inplace([complex(v) for v in a] + [0j] * (size - len(a)))
+        b_values = fast_fourier_transform_inplace([complex(v) for v in b] + [0j] * (size - len(b)))
+        return inverse_fast_fourier_transform([a_v * b_v for a_v, b_v in zip(a_values, b_values)])[:result_size]
 
+    # Real operands are transformed by the real transformation, which requires an even size
+    size = 2 * _next_fast_size((result_size + 1) // 2)
+    a_values = real_fast_fourier_transform(list(a) + [0.0] * (size - len(a)))
+    b_values = real_fast_fourier_transform(list(b) + [0.0] * (size - len(b)))
+    result = inverse_real_fast_fourier_transform([a_v * b_v for a_v, b_v in zip(a_values, b_values)], size)
+    result = result[:result_size]
+
+    if integral:
+        return [int(round(r)) for r in result]
     return result
 
 
+def poly_multiply(a: list, b: list) -> list:
+    """
+    Multiply polynomials 'a' and 'b', given as lists of coefficients starting from the lowest degree
+    :return: coefficients of the product
+    """
+    return convolve(a, b)
+
+
+# Primes of the form c * 2^k + 1 with a primitive root, used by number-theoretic transformations: (prime, root, k)
+NTT_PRIMES = (
+    (998244353, 3, 23),
+    (167772161, 3, 25),
+    (469762049, 3, 26),
+)
+
+# Integer convolutions whose coefficients may exceed this bound in absolute value are not calculated with floats
+FLOAT_CONVOLUTION_EXACT_BOUND = 2 ** 40
+
+
+def _convolution_bound(a: list, b: list) -> int:
+    """
+    Calculate an upper bound of absolute values of the convolution of integer sequences 'a' and 'b'
+    """
+    return max(abs(v) for v in a) * max(abs(v) for v in b) * min(len(a), len(b))
+
+
+def _get_ntt_stages(n: int, prime: int, root: int, inverse: bool) -> list:
+    """
+    Get a list of (half_size, twiddles) for every butterfly stage of a number-theoretic transformation of (power-of-two)
+    size 'n' modulo 'prime'
+    """
+    def create():
+        stages = []
+        half_size = 1
+        while half_size < n:
+            w = pow(root, (prime - 1) // (half_size * 2), prime)
+            if inverse:
+                w = pow(w, prime - 2, prime)
+            twiddles = [1] * half_size
+            for k in range(1, half_size):
+                twiddles[k] = twiddles[k - 1] * w % prime
+            stages.append((half_size, twiddles))
+            half_size *= 2
+        return stages
+
+    return _get_cached(('ntt', n, prime, inverse), create)
+
+
+def number_theoretic_transform_inplace(buffer: list, prime: int, root: int, inverse: bool = False) -> list:
+    """
+    Conduct a number-theoretic transformation of the 'buffer' of integers modulo 'prime' in place. It has the same
+    butterfly structure as the radix-2 fast Fourier transformation, with powers of the primitive 'root' in place of
+    complex roots of unity. The length of the 'buffer' must be a power of two dividing 'prime' - 1
+    :param inverse: conduct an inverse transformation, including the division by the length
+    :return: the 'buffer' itself
+    """
+    n = len(buffer)
+    if n & (n - 1) != 0 or (prime - 1) % max(n, 1) != 0:
+        raise Exception("Size {} is not supported by a number-theoretic transformation modulo {}".format(n, prime))
+    if n <= 1:
+        return buffer
+
+    for i, j in _get_plan(n).swaps:
+        buffer[i], buffer[j] = buffer[j], buffer[i]
+
+    for half_size, twiddles in _get_ntt_stages(n, prime, root, inverse):
+        size = half_size * 2
+        for start in range(0, n, size):
+            middle = start + half_size
+            end = start + size
+            evens = buffer[start:middle]
+            odds = [w * o % prime for w, o in zip(twiddles, buffer[middle:end])]
+            buffer[start:middle] = [(e + o) % prime for e, o in zip(evens, odds)]
+            buffer[middle:end] = [(e - o) % prime for e, o in zip(evens, odds)]
+
+    if inverse:
+        n_inverse = pow(n, prime - 2, prime)
+        buffer[:] = [v * n_inverse % prime for v in buffer]
+
+    return buffer
+
+
+def _convolve_modulo(a: list, b: list, size: int, prime: int, root: int) -> list:
+    """
+    Calculate a cyclic convolution of size 'size' of integer sequences 'a' and 'b' modulo 'prime'
+    """
+    a_values = number_theoretic_transform_inplace([v % prime for v in a] + [0] * (size - len(a)), prime, root)
+    b_values = number_theoretic_transform_inplace([v % prime for v in b] + [0] * (size - len(b)), prime, root)
+    return number_theoretic_transform_inplace(
+        [a_v * b_v % prime for a_v, b_v in zip(a_values, b_values)], prime, root, inverse=True
+    )
+
+
+def convolve_exact(a: list, b: list) -> list:
+    """
+    Calculate a linear convolution of integer sequences 'a' and 'b' exactly, using number-theoretic transformations
+    modulo several NTT_PRIMES. The residues are combined by the Chinese remainder theorem (Garner's algorithm); the
+    number of primes is chosen so that their product exceeds twice the largest possible absolute value of the result;
+    if even all primes are not enough, the operands are split into smaller limbs
+    :return: a list of len(a) + len(b) - 1 integers
+    """
+    if len(a) == 0 or len(b) == 0:
+        return []
+
+    result_size = len(a) + len(b) - 1
+    size = _next_power_of_two(result_size)
+
+    bound = 2 * _convolution_bound(a, b) + 1
+    primes = []
+    modulus = 1
+    for prime, root, max_power in NTT_PRIMES:
+        if modulus >= bound:
+            break
+        primes.append((prime, root, max_power))
+        modulus *= prime
+    if modulus < bound:
+        return _convolve_exact_split(a, b, modulus)
+    if size > (1 << min(max_power for _, _, max_power in primes)):
+        raise Exception("Convolution size {} is too large for number-theoretic transformations".format(size))
+
+    residues = [_convolve_modulo(a, b, size, prime, root)[:result_size] for prime, root, _ in primes]
+
+    # Garner's algorithm: result = r_0 + t_1 * p_0 + t_2 * p_0 * p_1 + ...
+    result = residues[0]
+    modulus = primes[0][0]
+    for (prime, _, _), residue in zip(primes[1:], residues[1:]):
+        modulus_inverse = pow(modulus % prime, prime - 2, prime)
+        result = [r + ((residue_i - r) * modulus_inverse % prime) * modulus for r, residue_i in zip(result, residue)]
+        modulus *= prime
+
+    half_modulus = modulus // 2
+    return [r - modulus if r > half_modulus else r for r in result]
+
+
+def _convolve_exact_split(a: list, b: list, modulus: int) -> list:
+    """
+    Calculate a linear convolution of integer sequences 'a' and 'b' whose coefficients are too large to be recovered
+    modulo 'modulus'. The operands are split into limbs small enough for convolve_exact, and the convolutions of limbs
+    are combined
+    """
+    limb_bits = (modulus.bit_length() - 3 - min(len(a), len(b)).bit_length()) // 2
+    mask = (1 << limb_bits) - 1
+
+    def split(sequence: list) -> list:
+        limbs_count = (max(abs(v) for v in sequence).bit_length() + limb_bits - 1) // limb_bits
+        limbs = []
+        for i in range(limbs_count):
+            shift = i * limb_bits
+            limbs.append([((v >> shift) & mask) if v >= 0 else -((-v >> shift) & mask) for v in sequence])
+        return limbs
+
+    result = [0] * (len(a) + len(b) - 1)
+    for i, a_limb in enumerate(split(a)):
+        for j, b_limb in enumerate(split(b)):
+            shift = (i + j) * limb_bits
+            for k, r in enumerate(convolve_exact(a_limb, b_limb)):
+                result[k] += r << shift
+    return result
+
+
+STREAM_READ_SIZE = 1 << 16  # Number of characters read from a stream at once
+STREAM_BLOCK_SIZE = 1 << 14  # Number of samples in a block produced by read_sample_blocks
+STREAM_MIN_TRANSFORM_SIZE = 1 << 12  # Minimum transformation size chosen by overlap_add_convolve
+
+
+def read_sample_blocks(stream, block_size: int = STREAM_BLOCK_SIZE):
+    """
+    Read whitespace-separated real samples from a text 'stream' without loading it into memory entirely
+    :return: a generator of lists of 'block_size' samples; the last list may be shorter
+    """
+    block = []
+    remainder = ''
+    while True:
+        chunk = stream.read(STREAM_READ_SIZE)
+        if len(chunk) == 0:
+            break
+        tokens = (remainder + chunk).split()
+        # The last token may continue in the next chunk
+        if not chunk[-1].isspace() and len(tokens) > 0:
+            remainder = tokens.pop()
+        else:
+            remainder = ''
+        block.extend(map(float, tokens))
+        while len(block) >= block_size:
+            yield block[:block_size]
+            block = block[block_size:]
+
+    if len(remainder) > 0:
+        block.append(float(remainder))
+    if len(block) > 0:
+        yield block
+
+
+def overlap_add_convolve(sample_blocks, kernel: list, block_size: int = None):
+    """
+    Calculate a linear convolution of an unbounded real signal with a fixed real 'kernel' by the overlap-add method.
+    The kernel is transformed once; every block of the signal is convolved with it by real transformations, and the
+    overlapping tail is carried to the next block, so memory does not depend on the signal length
+    :param sample_blocks: an iterable of lists of consecutive samples of any length
+    :param block_size: number of samples convolved at once; chosen automatically by default
+    :return: a generator of lists of consecutive samples of the convolution. Their total length is the signal length
+    plus len(kernel) - 1
+    """
+    kernel_size = len(kernel)
+    if kernel_size == 0:
+        raise Exception("The convolution kernel must not be empty")
+
+    if block_size is None:
+        size = 2 * _next_fast_size(max(STREAM_MIN_TRANSFORM_SIZE, 4 * kernel_size) // 2)
+        block_size = size - kernel_size + 1
+    else:
+        # The smallest even transformation size to hold block_size + kernel_size - 1 samples
+        size = 2 * _next_fast_size((block_size + kernel_size) // 2)
+
+    kernel_values = real_fast_fourier_transform(list(kernel) + [0.0] * (size - kernel_size))
+
+    tail = [0.0] * (kernel_size - 1)
+    for samples in sample_blocks:
+        for start in range(0, len(samples), block_size):
+            block = list(samples[start:start + block_size])
+            block_values = real_fast_fourier_transform(block + [0.0] * (size - len(block)))
+            result = inverse_real_fast_fourier_transform(
+                [v * k for v, k in zip(block_values, kernel_values)], size
+            )
+            for i, t in enumerate(tail):
+                result[i] += t
+
+            yield result[:len(block)]
+            tail = result[len(block):len(block) + kernel_size - 1]
+
+    yield tail
+
+
+INTEGER_LIMB_BITS = 16  # Size of a limb in bits, used by multiply_integers
+
+
+def multiply_integers(x: int, y: int) -> int:
+    """
+    Multiply integers 'x' and 'y' exactly, splitting them into INTEGER_LIMB_BITS-bit limbs and convolving the limbs by
+    number-theoretic transformations
+    """
+    sign = -1 if (x < 0) != (y < 0) else 1
+    x = abs(x)
+    y = abs(y)
+    if x == 0 or y == 0:
+        return 0
+
+    mask = (1 << INTEGER_LIMB_BITS) - 1
+    x_limbs = [(x >> shift) & mask for shift in range(0, x.bit_length(), INTEGER_LIMB_BITS)]
+    y_limbs = [(y >> shift) & mask for shift in range(0, y.bit_length(), INTEGER_LIMB_BITS)]
+
+    result = 0
+    for limb in reversed(convolve_exact(x_limbs, y_limbs)):
+        result = (result << INTEGER_LIMB_BITS) + limb
+    return sign * result
+
+
 if __name__ == '__main__':
     main()